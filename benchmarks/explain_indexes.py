@@ -0,0 +1,114 @@
+"""
+Captures EXPLAIN ANALYZE of the hot queries with and without the indexes of
+migration 4 (see coreborn/database/migrations.py), against the configured database.
+
+	python benchmarks/explain_indexes.py [--runs 5] [--plans]
+
+The indexes are dropped inside a transaction that is rolled back afterwards,
+but DROP INDEX still takes an exclusive lock on the tables for the duration,
+so run this against a copy rather than a live database.
+"""
+import argparse
+import json
+import statistics
+
+import psycopg2
+
+from coreborn.config import config
+
+INDEXES = ('positions_ip_idx', 'node_removal_ip_idx', 'resources_category_idx')
+
+# name -> (query, parameters), parameters are filled in from the data by sample()
+QUERIES = {
+	'map' : ("""
+		SELECT positions.resource, positions.id, positions.x, positions.y
+		FROM positions
+		LEFT JOIN ip_addresses ON positions.ip=ip_addresses.id
+		WHERE ip_addresses.blocked IS NOT TRUE
+		ORDER BY positions.resource, positions.id""", ()),
+	'resource positions' : ("SELECT x, y FROM positions WHERE resource=%(resource)s", ('resource', )),
+	'positions of an ip' : ("SELECT id FROM positions WHERE ip=%(ip)s", ('ip', )),
+	'votes of an ip' : ("SELECT id FROM node_removal WHERE ip=%(ip)s", ('ip', )),
+	'votes of a position' : ("SELECT count(*) FROM node_removal WHERE resource=%(position)s", ('position', )),
+	'resources of a category' : ("SELECT id, name FROM resources WHERE category=%(category)s", ('category', )),
+	'ip lookup' : ("SELECT id, blocked FROM ip_addresses WHERE ip=%(ip_hash)s", ('ip_hash', )),
+}
+
+def sample(cur):
+	"""
+	Picks the most used resource, ip and category so the queries have something to find.
+	"""
+	cur.execute("SELECT resource, count(*) FROM positions GROUP BY resource ORDER BY 2 DESC LIMIT 1")
+	resource, = cur.fetchone() or (0, )
+	cur.execute("SELECT ip, count(*) FROM positions WHERE ip IS NOT NULL GROUP BY ip ORDER BY 2 DESC LIMIT 1")
+	ip, = cur.fetchone() or (0, )
+	cur.execute("SELECT ip FROM ip_addresses WHERE id=%s", (ip, ))
+	ip_hash, = cur.fetchone() or ('', )
+	cur.execute("SELECT category FROM resources WHERE id=%s", (resource, ))
+	category, = cur.fetchone() or ('', )
+	cur.execute("SELECT id FROM positions WHERE resource=%s LIMIT 1", (resource, ))
+	position, = cur.fetchone() or (0, )
+	return {'resource' : resource, 'ip' : ip, 'ip_hash' : ip_hash, 'category' : category, 'position' : position}
+
+def explain(cur, query, parameters, runs):
+	"""
+	Returns (median execution ms, median planning ms, last plan) over `runs` runs.
+	"""
+	executions, plannings, plan = [], [], None
+	for _ in range(runs):
+		cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", parameters)
+		result = cur.fetchone()[0]
+		result = result[0] if isinstance(result, list) else json.loads(result)[0]
+		executions.append(result['Execution Time'])
+		plannings.append(result['Planning Time'])
+		plan = result['Plan']
+
+	return statistics.median(executions), statistics.median(plannings), plan
+
+def describe(plan):
+	nodes = [plan['Node Type'] + (f" on {plan['Index Name']}" if 'Index Name' in plan else '')]
+	for child in plan.get('Plans', []):
+		nodes += describe(child)
+	return nodes
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--runs', type=int, default=5, help='Runs per query, the median is reported')
+	parser.add_argument('--plans', action='store_true', default=False, help='Also print the plan nodes')
+	args = parser.parse_args()
+
+	connection = psycopg2.connect(
+		dbname=config.db.database,
+		user=config.db.username,
+		password=config.db.password,
+		host=config.db.hostname
+	)
+
+	results = {}
+	try:
+		with connection.cursor() as cur:
+			parameters = sample(cur)
+			cur.execute("SELECT count(*) FROM positions")
+			print(f"{cur.fetchone()[0]} positions, runs per query: {args.runs}")
+
+			for label in ('with indexes', 'without indexes'):
+				if label == 'without indexes':
+					for index in INDEXES:
+						cur.execute(f"DROP INDEX IF EXISTS {index}")
+
+				for name, (query, used) in QUERIES.items():
+					results[(name, label)] = explain(cur, query, {key : parameters[key] for key in used}, args.runs)
+	finally:
+		connection.rollback()
+		connection.close()
+
+	print(f"{'query':<26}{'without (ms)':>14}{'with (ms)':>12}")
+	for name in QUERIES:
+		before, after = results[(name, 'without indexes')], results[(name, 'with indexes')]
+		print(f"{name:<26}{before[0]:>14.3f}{after[0]:>12.3f}")
+		if args.plans:
+			print(f"    without: {' > '.join(describe(before[2]))}")
+			print(f"    with:    {' > '.join(describe(after[2]))}")
+
+if __name__ == '__main__':
+	main()
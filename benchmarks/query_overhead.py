@@ -0,0 +1,104 @@
+"""
+Times Database.query() (plain SQL, RealDictCursor rows copied into dicts) against
+Database.execute() (named prepared Statement, named tuple rows) on the same queries,
+against the configured database.
+
+	python benchmarks/query_overhead.py [--runs 200] [--warmup 20]
+
+Both run on the same pool, with the calls interleaved so that caching on the
+server side and load from elsewhere affect them alike. Only reads are timed,
+so it's safe to run against a live database.
+"""
+import argparse
+import statistics
+import time
+
+from coreborn.catalog import SELECT_RESOURCES
+from coreborn.config import config
+from coreborn.database.postgresql import Database
+from coreborn.database.statements import Statement
+
+# Same as coreborn.app.MAP_POSITIONS, which can't be imported without starting the app
+MAP_POSITIONS = Statement('bench_map_positions', """
+	SELECT positions.resource, positions.id, positions.x, positions.y
+	FROM positions
+	LEFT JOIN ip_addresses ON positions.ip=ip_addresses.id
+	WHERE ip_addresses.blocked IS NOT TRUE
+	ORDER BY positions.resource, positions.id""")
+
+IP_BLOCKED = Statement('bench_ip_blocked', "SELECT id, blocked FROM ip_addresses WHERE ip=%s", mode='one')
+
+RESOURCE_POSITIONS = Statement('bench_resource_positions', "SELECT id, x, y FROM positions WHERE resource=%s")
+
+def sample(database):
+	"""
+	Picks an existing ip hash and the most used resource, so the point queries find something.
+	"""
+	ip = database.query("SELECT ip FROM ip_addresses ORDER BY id LIMIT 1")
+	resource = database.query("SELECT resource FROM positions GROUP BY resource ORDER BY count(*) DESC LIMIT 1")
+	return (ip or {}).get('ip', ''), (resource or {}).get('resource', 0)
+
+def timed(call):
+	start = time.perf_counter()
+	call()
+	return (time.perf_counter() - start) * 1000
+
+def percentile(values, fraction):
+	ordered = sorted(values)
+	return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--runs', type=int, default=200, help='Timed calls per query and method')
+	parser.add_argument('--warmup', type=int, default=20, help='Untimed calls first, which also prepares the statements')
+	args = parser.parse_args()
+
+	# A single connection, so every execute() after the warmup runs on an already prepared statement
+	database = Database(
+		dbname=config.db.database,
+		user=config.db.username,
+		password=config.db.password,
+		host=config.db.hostname,
+		min_connections=1,
+		max_connections=1
+	)
+
+	try:
+		ip, resource = sample(database)
+		count = database.query("SELECT count(*) AS count FROM positions")['count']
+		print(f"{count} positions, runs per query: {args.runs}")
+
+		cases = {
+			'map' : (MAP_POSITIONS, ()),
+			'resources' : (SELECT_RESOURCES, ()),
+			'positions of a resource' : (RESOURCE_POSITIONS, (resource, )),
+			'ip lookup' : (IP_BLOCKED, (ip, )),
+		}
+
+		print(f"{'query':<26}{'query() ms':>12}{'p95':>9}{'execute() ms':>14}{'p95':>9}{'speedup':>9}")
+		for name, (statement, values) in cases.items():
+			def plain():
+				database.query(statement.sql, values or None, force_list=statement.mode == 'many')
+
+			def prepared():
+				database.execute(statement, values)
+
+			for _ in range(args.warmup):
+				plain()
+				prepared()
+
+			plains, prepareds = [], []
+			for _ in range(args.runs):
+				plains.append(timed(plain))
+				prepareds.append(timed(prepared))
+
+			before, after = statistics.median(plains), statistics.median(prepareds)
+			print(
+				f"{name:<26}{before:>12.3f}{percentile(plains, 0.95):>9.3f}"
+				f"{after:>14.3f}{percentile(prepareds, 0.95):>9.3f}{before / after:>8.2f}x"
+			)
+	finally:
+		database.close()
+
+if __name__ == '__main__':
+	main()
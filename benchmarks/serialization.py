@@ -0,0 +1,94 @@
+"""
+Compares the cost and size of serializing the map the old way (jsonable_encoder and
+the standard json module, as FastAPI's JSONResponse does) against coreborn.encoding.dumps()
+and the bytes MapEntry keeps per data version, on the packaged seed positions.
+
+	python benchmarks/serialization.py [--scale 10] [--runs 200] [--repeat 5]
+
+--scale multiplies the seed positions (jittered copies) to approximate a busier map.
+Doesn't need a database. jsonable_encoder is only timed when fastapi is installed,
+orjson is used by dumps() when it's installed (pip install coreborn[fast]).
+"""
+import argparse
+import json
+import random
+import timeit
+
+from coreborn import encoding
+from coreborn.encoding import CODINGS, compress, dumps
+from coreborn.snapshot import MapEntry
+from coreborn.startup import init_data, load_seed_positions
+from coreborn.wire import encode
+
+try:
+	from fastapi.encoders import jsonable_encoder
+except ImportError:
+	jsonable_encoder = None
+
+def build(scale :int):
+	"""
+	The same structure build_map() returns, filled with the seed positions.
+	"""
+	random.seed(0)
+	categories = {resource : category for category, resources in init_data.items() for resource in resources}
+	data = {category : {} for category in init_data}
+	identity = 0
+	for resource, coordinates in load_seed_positions():
+		positions = []
+		for copy in range(scale):
+			for x, y in zip(coordinates[0::2], coordinates[1::2]):
+				identity += 1
+				if copy:
+					x = min(max(x + random.uniform(-0.01, 0.01), 0.0), 1.0)
+					y = min(max(y + random.uniform(-0.01, 0.01), 0.0), 1.0)
+				positions.append({'id' : identity, 'x' : x, 'y' : y})
+
+		data[categories[resource]][resource] = {'icon' : None, 'color' : '#F444FF', 'visible' : True, 'positions' : positions}
+
+	return data, identity
+
+def old_path(data):
+	# What JSONResponse.render() did with the handler's return value
+	content = jsonable_encoder(data) if jsonable_encoder is not None else data
+	return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode('UTF-8')
+
+def best(call, runs :int, repeat :int):
+	return min(timeit.repeat(call, number=runs, repeat=repeat)) / runs * 1_000_000
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--scale', type=int, default=1, help='Copies of the seed positions')
+	parser.add_argument('--runs', type=int, default=200, help='Calls per timing')
+	parser.add_argument('--repeat', type=int, default=5, help='Timings per path, the best is reported')
+	args = parser.parse_args()
+
+	data, count = build(args.scale)
+	entry = MapEntry.build(0, data)
+
+	old = old_path(data)
+	new = dumps(data)
+	if json.loads(old) != json.loads(new):
+		raise SystemExit("The old and new encodings don't decode to the same data")
+
+	old_label = 'jsonable_encoder + json.dumps' if jsonable_encoder is not None else 'json.dumps (fastapi not installed)'
+	new_label = f"dumps() ({'orjson' if encoding.orjson is not None else 'stdlib json, orjson not installed'})"
+
+	print(f"{count} positions, best of {args.repeat} x {args.runs} runs")
+	print(f"{'path':<52}{'us per call':>12}{'bytes':>10}")
+	for label, call, size in (
+		(old_label, lambda: old_path(data), len(old)),
+		(new_label, lambda: dumps(data), len(new)),
+		('cached MapEntry.body (unchanged version)', lambda: entry.body, len(entry.body)),
+	):
+		print(f"{label:<52}{best(call, args.runs, args.repeat):>12.1f}{size:>10}")
+
+	print()
+	print(f"{'payload':<52}{'bytes':>10}")
+	for format in ('json', 'columnar', 'binary'):
+		body = encode(data, format)
+		print(f"{format:<52}{len(body):>10}")
+		for coding in CODINGS:
+			print(f"{f'  {format} {coding}':<52}{len(compress(body, coding)):>10}")
+
+if __name__ == '__main__':
+	main()
@@ -1,2 +1,16 @@
 __version__ = 0.1
-from .app import app
\ No newline at end of file
+
+def __getattr__(name):
+	# Importing the app connects to (and migrates) the database, so it's only
+	# done once something actually asks for coreborn.app (such as uvicorn coreborn:app)
+	if name == 'app':
+		from .app import app
+		# Importing the submodule bound coreborn.app to it, point it at the FastAPI app instead
+		globals()['app'] = app
+		return app
+
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def run_as_a_module():
+	from .cli import main
+	main()
@@ -1,17 +1,28 @@
 import psycopg2.extras
+import asyncio
 import ipaddress
 import os
 import hashlib
 import pydantic
 from typing import Union
-from fastapi import FastAPI, Request, Header, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Header, Body, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 
-from .database.postgresql import Database
+from .catalog import ResourceCatalog
+from .database.postgresql import Database, ThreadedDatabase
+from .database.statements import Statement
 from .config import config
-from .models import Position
-from .startup import init_data
+from .dedupe import PositionIndex
+from .encoding import dumps, negotiate_coding
+from .ipcache import IPCache
+from .ratelimit import RateLimiter
+from .live import Broadcaster, CHANNEL
+from .models import Position, BulkPosition
+from .snapshot import MapSnapshot
+from .streaming import relay, stream_map
+from .wire import FORMATS, encode, negotiate
+from .writebehind import WriteBehind
 
 app = FastAPI()
 
@@ -23,62 +34,581 @@ async def validation_exception_handler(request: Request, exc: pydantic.Validatio
 		content=jsonable_encoder({"detail": exc.errors(), "Error": "Entity not permitted"}),
 	)
 
-db = Database(dbname=config.db.database, user=config.db.username, password=config.db.password, host=config.db.hostname)
-db.init()
+database_options = dict(
+	dbname=config.db.database,
+	user=config.db.username,
+	password=config.db.password,
+	host=config.db.hostname,
+	min_connections=config.db.pool_min,
+	max_connections=config.db.pool_max
+)
+
+# The schema is always migrated through the blocking driver,
+# the configured backend is then used by all the route handlers.
+# Seeding the starting data is a separate step, see `coreborn seed`.
+database = Database(**database_options)
+database.migrate()
+
+if config.db.backend == 'async':
+	from .database.postgresql_async import AsyncDatabase
+
+	database.close()
+	db = AsyncDatabase(**database_options)
+else:
+	db = ThreadedDatabase(database)
+
+# Resource names, ids and categories, kept in memory and refreshed
+# whenever the resources table changes (see on_change below).
+catalog = ResourceCatalog()
+ipcache = IPCache(max_size=config.ipcache.max_size, ttl=config.ipcache.ttl)
+positions_index = PositionIndex()
+background_tasks = set()
+
+# With the cache disabled every read streams from a pooled connection, this keeps
+# some of the pool free for everything else (see [cache] max_streams)
+stream_slots = asyncio.Semaphore(config.cache.max_streams)
+
+# One token bucket per write endpoint, keyed by ip hash
+limiters = {
+	endpoint : RateLimiter(
+		rate=bucket.rate,
+		burst=bucket.burst,
+		max_keys=config.ratelimit.max_keys,
+		block_after=config.ratelimit.block_after,
+		block_window=config.ratelimit.block_window
+	) for endpoint, bucket in (
+		('put', config.ratelimit.put),
+		('bulk', config.ratelimit.bulk),
+		('delete', config.ratelimit.delete)
+	)
+}
+
+@app.on_event("startup")
+async def open_database():
+	await db.open()
+	await catalog.refresh(db)
+	if config.dedupe.radius > 0:
+		await positions_index.load(db, catalog)
+	# Always listening, as other workers' writes invalidate this worker's caches through it.
+	# [live] enabled only decides whether clients can subscribe on /api/live.
+	broadcaster.start(asyncio.get_running_loop())
+	if config.writebehind.enabled:
+		writebehind.start()
+
+	pruner = asyncio.create_task(prune_position_changes())
+	background_tasks.add(pruner)
+	pruner.add_done_callback(background_tasks.discard)
+
+@app.on_event("shutdown")
+async def close_database():
+	for task in list(background_tasks):
+		task.cancel()
+	broadcaster.stop()
+	if config.writebehind.enabled:
+		await writebehind.stop()
+	await db.close()
 
 def validate_category(category):
-	if category in init_data:
+	if category in catalog.resources:
 		return True
 
 	raise ValueError(f"Resource category does not exist")
 
 def validate_resource(resource, allow_wildcard=False):
-	if resource == '*':
+	if allow_wildcard and resource == '*':
 		return True
 
-	for category in init_data:
-		if resource in init_data[category]:
-			return True
+	if resource in catalog.categories:
+		return True
 
 	raise ValueError(f"Resource does not exist in resource list")
 
-def validate_resource_id(category, resource, identity):
+def validate_viewport(x0, y0, x1, y1):
+	if x0 is None and y0 is None and x1 is None and y1 is None:
+		return None
+
+	if None in (x0, y0, x1, y1):
+		raise ValueError(f"Viewport needs all of x0, y0, x1 and y1")
+
+	if not (0.0 <= x0 <= x1 <= 1.0 and 0.0 <= y0 <= y1 <= 1.0):
+		raise ValueError(f"Viewport is off the charts")
+
+	return x0, y0, x1, y1
+
+BLOCK_IP = Statement('block_ip', "UPDATE ip_addresses SET blocked=true WHERE ip=%s", mode='none')
+
+async def admit(endpoint, ip_hash, cost=1):
+	"""
+	Applies the rate limit of `endpoint` before any database work is done,
+	returns None if the request may proceed or a 429 response if not.
+	"""
+	if not config.ratelimit.enabled:
+		return None
+
+	allowed, retry_after, block = limiters[endpoint].check(ip_hash, cost)
+	if allowed:
+		return None
+
+	if block:
+		print(f"Blocking {ip_hash} after {config.ratelimit.block_after} rate limited requests")
+		# The ip_addresses trigger will NOTIFY every worker to drop it from their ipcache
+		await db.execute(BLOCK_IP, (ip_hash, ))
+
+	return JSONResponse(
+		status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+		content={'error': 'Too many requests, slow down'},
+		headers={'Retry-After' : str(retry_after)} if retry_after is not None else None
+	)
+
+def validate_resource_category(category, resource):
 	validate_category(category)
 	validate_resource(resource)
-	# TODO: Should probably add a strict check that the ID matches the above
-	# category and resource type as well.
-	if db.query("SELECT id FROM positions WHERE id=%s", (identity, )):
+
+	if catalog.category_of(resource) == category:
 		return True
 
-	raise ValueError(f"Resource ID does not exist")
+	raise ValueError(f"Resource does not belong to category")
+
+def validate_selection(category, resource):
+	if category is not None:
+		validate_category(category)
+
+	validate_resource(resource, allow_wildcard=True)
+
+	if category is not None and resource != '*' and catalog.category_of(resource) != category:
+		raise ValueError(f"Resource does not belong to category")
+
+	return True
 
 @app.get("/api/resources/{resource}")
-def get_resource(resource :Union[str, None] = None):
+async def get_resource(
+		resource :Union[str, None] = None,
+		category :str|None = None,
+		x0 :float|None = None,
+		y0 :float|None = None,
+		x1 :float|None = None,
+		y1 :float|None = None,
+		format :str|None = None,
+		Accept: str|None = Header(None),
+		Accept_Encoding: str|None = Header(None),
+		If_None_Match: str|None = Header(None)):
+	"""
+	Returns the positions of `resource` (or every resource for *), optionally only those
+	in `category` and with x0, y0, x1 and y1 given only those inside that bounding box.
+	The representation is json unless a compact one (see coreborn.wire) is asked for
+	through ?format=columnar|binary or the Accept header.
+	Anything but a viewport is served precompressed (per data version) when Accept-Encoding allows it.
+	With [cache] disabled the response is always json, streamed straight from the database.
+	"""
 	try:
-		validate_resource(resource, allow_wildcard=True)
+		validate_selection(category, resource)
+		viewport = validate_viewport(x0, y0, x1, y1)
+		if (format := negotiate(format, Accept)) is None:
+			raise ValueError(f"Unknown format, use one of {', '.join(FORMATS)}")
 	except ValueError:
 		return {'error': 'Invalid data sent to server'}
 
-	result = {}
-	for category in {row['category'] for row in db.query("SELECT DISTINCT(category) FROM resources")}:
-		result[category] = {}
+	if not config.cache.enabled:
+		if format != 'json':
+			return JSONResponse(
+				status_code=status.HTTP_406_NOT_ACCEPTABLE,
+				content={'error': 'Only json is available while the cache is disabled'}
+			)
+
+		if stream_slots.locked():
+			return JSONResponse(
+				status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+				content={'error': 'Too many reads in progress, try again shortly'},
+				headers={'Retry-After' : '1'}
+			)
+
+		return StreamingResponse(
+			relay(
+				stream_map(db, catalog, config.colors, category, resource, viewport),
+				stream_slots,
+				timeout=config.cache.stream_timeout
+			),
+			media_type='application/json',
+			headers={'Cache-Control' : 'no-cache'}
+		)
+
+	entry = await snapshot.get()
+	# Viewports are cut per request, so only the full map is worth compressing ahead of time
+	coding = negotiate_coding(Accept_Encoding) if not viewport else None
+	# The viewport response is fully determined by the map and the URL,
+	# which means the map ETag is a valid validator for it as well.
+	headers = {
+		'ETag' : entry.etag_for(format, coding),
+		'Cache-Control' : 'public, no-cache',
+		'Vary' : 'Accept, Accept-Encoding'
+	}
+
+	if entry.matches(If_None_Match, headers['ETag']):
+		return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+	if coding:
+		headers['Content-Encoding'] = coding
+
+	if viewport:
+		return Response(
+			content=encode(entry.viewport(*viewport, resource=resource, category=category), format),
+			media_type=FORMATS[format],
+			headers=headers
+		)
+
+	return Response(content=await entry.encoded(format, coding, category, resource), media_type=FORMATS[format], headers=headers)
 
-		for resource in init_data[category]:
-			result[category][resource] = {
+@app.get("/api/clusters/{zoom}")
+async def get_clusters(
+		zoom :int,
+		x0 :float|None = None,
+		y0 :float|None = None,
+		x1 :float|None = None,
+		y1 :float|None = None,
+		If_None_Match: str|None = Header(None)):
+	"""
+	Returns cluster centroids with counts per resource for the given zoom level
+	(where zoom z divides the map into 2**z cells per axis), optionally within a viewport.
+	"""
+	try:
+		viewport = validate_viewport(x0, y0, x1, y1)
+	except ValueError:
+		return {'error': 'Invalid data sent to server'}
+
+	entry = await snapshot.get()
+	headers = {
+		'ETag' : entry.etag,
+		'Cache-Control' : 'public, no-cache'
+	}
+
+	if entry.matches(If_None_Match):
+		return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+	return Response(
+		content=dumps({
+			'zoom' : min(max(zoom, 0), config.clusters.max_zoom),
+			'clusters' : entry.clusters(zoom, config.clusters.max_zoom, viewport)
+		}),
+		media_type='application/json',
+		headers=headers
+	)
+
+MAP_POSITIONS = Statement('map_positions', """
+	SELECT positions.resource, positions.id, positions.x, positions.y
+	FROM positions
+	LEFT JOIN ip_addresses ON positions.ip=ip_addresses.id
+	WHERE ip_addresses.blocked IS NOT TRUE
+	ORDER BY positions.resource, positions.id""")
+
+async def build_map():
+	"""
+	Builds the full map response from a single sorted scan over the visible positions,
+	grouped per category and resource in Python using the resource catalog.
+	Resources without any positions are still listed (with an empty position list).
+	"""
+	result = {
+		category : {
+			name : {
 				'icon' : None,
-				'color' : getattr(config.colors, resource, '#F444FF'),
+				'color' : getattr(config.colors, name, '#F444FF'),
 				'visible' : True,
-				'positions' : db.query("""
-					SELECT positions.id, positions.x, positions.y FROM positions as positions, ip_addresses as ip_addresses, resources as resources
-					WHERE (positions.resource=resources.id AND resources.name=%s)
-					  AND (positions.ip=ip_addresses.id AND ip_addresses.blocked='f')
-					  AND (positions.resource=resources.id AND resources.category=%s)""", (resource, category), force_list=True)
-			}
+				'positions' : []
+			} for name in resources
+		} for category, resources in catalog.resources.items()
+	}
+
+	for resource, identity, x, y in await db.execute(MAP_POSITIONS):
+		if (resource := catalog.names.get(resource)) is None:
+			continue
+
+		result[catalog.categories[resource]][resource]['positions'].append({'id' : identity, 'x' : x, 'y' : y})
 
 	return result
 
+# Every write handler bumps the snapshot version, which is the only thing
+# that causes the next read to hit the database again.
+snapshot = MapSnapshot(builder=build_map)
+
+def changed_positions(payload):
+	"""
+	Adds and removes are NOTIFY'd either as a single position or, for statements
+	that change many at once, as a list of them under "positions".
+	"""
+	return payload.get('positions') or [payload]
+
+# Writes from any worker are NOTIFY'd by Postgres, which also
+# tells this worker that its snapshot is out of date.
+def on_change(payload):
+	# Blocking or unblocking an IP changes which positions are visible as well
+	snapshot.bump()
+
+	if payload.get('op') == 'ip':
+		ipcache.invalidate(payload.get('ip'))
+	elif payload.get('op') == 'resync':
+		ipcache.invalidate()
+	elif payload.get('op') == 'add':
+		for position in changed_positions(payload):
+			positions_index.add(position['resource'], position['id'], position['x'], position['y'])
+	elif payload.get('op') == 'remove':
+		for position in changed_positions(payload):
+			positions_index.remove(position['resource'], position['id'])
+
+	# The catalog only changes when seeding, or we might have missed it while reconnecting.
+	# The positions index is reloaded as well, as seeding and blocking changes what's visible.
+	if payload.get('op') in ('catalog', 'resync', 'ip'):
+		async def refresh():
+			if payload.get('op') != 'ip':
+				await catalog.refresh(db)
+			if config.dedupe.radius > 0:
+				await positions_index.load(db, catalog)
+			snapshot.bump()
+
+		task = asyncio.create_task(refresh())
+		background_tasks.add(task)
+		task.add_done_callback(background_tasks.discard)
+
+broadcaster = Broadcaster(
+	database=database,
+	queue_size=config.live.queue_size,
+	max_subscribers=config.live.max_subscribers,
+	on_change=on_change
+)
+
+@app.get("/api/metrics")
+async def get_metrics():
+	return {
+		'snapshot' : snapshot.stats,
+		'live' : broadcaster.stats,
+		'ipcache' : ipcache.stats,
+		'ratelimit' : {endpoint : limiter.stats for endpoint, limiter in limiters.items()},
+		'writebehind' : writebehind.stats
+	}
+
+@app.get("/api/live")
+async def live_resources():
+	"""
+	Streams position changes as Server-Sent Events ("add", "remove" and "resync").
+	A bulk insert arrives as a few events with a "positions" list each, rather than one event per position.
+	"""
+	if not config.live.enabled or not (subscriber := broadcaster.subscribe()):
+		return JSONResponse(
+			status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+			content={'error': 'Live updates are not available right now'}
+		)
+
+	async def stream():
+		try:
+			async for event in subscriber.events(config.live.keepalive):
+				yield event
+		finally:
+			broadcaster.unsubscribe(subscriber)
+
+	return StreamingResponse(
+		stream(),
+		media_type='text/event-stream',
+		headers={'Cache-Control' : 'no-cache', 'X-Accel-Buffering' : 'no'}
+	)
+
+def parse_sync_cursor(cursor):
+	"""
+	Returns the transaction id the cursor points at, or None for a cursor
+	in the old "<position id>.<tombstone id>" form, which can only be answered with a full resync.
+	"""
+	if '.' in cursor:
+		return None
+
+	if not cursor.isdigit():
+		raise ValueError(f"Invalid sync cursor")
+
+	return int(cursor)
+
+# Every transaction older than this has finished, so all the position_changes they made are visible.
+# It is read before the changes themselves, anything that commits in between is returned again next time.
+SYNC_HORIZON = Statement('sync_horizon', """
+	SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS horizon""", mode='one')
+
+SYNC_POSITIONS = Statement('sync_positions', """
+	SELECT positions.id AS position, positions.resource, 'add' AS op, positions.x, positions.y
+	FROM positions
+	LEFT JOIN ip_addresses ON positions.ip=ip_addresses.id
+	WHERE ip_addresses.blocked IS NOT TRUE
+	ORDER BY positions.id""")
+
+# Only the last change of each position matters, changes to the same position are serialized
+# by row locks so the id (unlike the txid) follows the order they were made in.
+# The pruned horizon is read in the same statement (and so the same snapshot) as the changes,
+# a cursor below it gets a single row with only `pruned` set, as the changes since have been deleted.
+SYNC_CHANGES = Statement('sync_changes', """
+	SELECT state.horizon::text AS pruned, changes.position, changes.resource, changes.op, changes.x, changes.y
+	FROM sync_state AS state
+	LEFT JOIN LATERAL (
+		SELECT DISTINCT ON (position) position, resource, op, x, y
+		FROM position_changes
+		WHERE txid >= %s::text::xid8 AND txid < %s::text::xid8
+		ORDER BY position, id DESC
+	) AS changes ON %s::text::xid8 >= state.horizon
+	WHERE state.name='pruned'
+	ORDER BY changes.position""")
+
+@app.get("/api/sync")
+async def sync_resources(cursor :str|None = None):
+	"""
+	Returns the positions added and removed since the given cursor, together with a new cursor.
+	Without a cursor (or with one that can't be continued, such as one older than [sync] retention_days)
+	every position is returned as added, with "reset" set to tell the client to drop what it had.
+	"""
+	try:
+		since = parse_sync_cursor(cursor) if cursor is not None else None
+	except ValueError:
+		return {'error': 'Invalid data sent to server'}
+
+	horizon = (await db.execute(SYNC_HORIZON)).horizon
+	if since is not None:
+		changes = await db.execute(SYNC_CHANGES, (str(since), horizon, str(since)))
+		if changes and since < int(changes[0].pruned):
+			# Some of the changes since then have been pruned already
+			since = None
+		else:
+			changes = [row for row in changes if row.position is not None]
+
+	if since is None:
+		changes = await db.execute(SYNC_POSITIONS)
+
+	def describe(row):
+		resource = catalog.names.get(row.resource)
+		return {'id' : row.position, 'category' : catalog.category_of(resource), 'resource' : resource}
+
+	return {
+		'cursor' : horizon,
+		'reset' : since is None,
+		'added' : [{**describe(row), 'x' : row.x, 'y' : row.y} for row in changes if row.op == 'add'],
+		'removed' : [describe(row) for row in changes if row.op == 'remove']
+	}
+
+PRUNE_POSITION_CHANGES = Statement('prune_position_changes', "SELECT prune_position_changes(%s::interval) AS deleted", mode='one')
+
+async def prune_position_changes():
+	"""
+	Deletes the position changes older than [sync] retention_days every [sync] prune_interval seconds.
+	Every worker runs this, the database function has them take turns.
+	"""
+	while True:
+		try:
+			result = await db.execute(PRUNE_POSITION_CHANGES, (f"{config.sync.retention_days} days", ))
+			if result.deleted:
+				print(f"Pruned {result.deleted} position changes older than {config.sync.retention_days} days")
+		except Exception as error:
+			print(f"Pruning position changes failed: {error!r}")
+
+		await asyncio.sleep(config.sync.prune_interval)
+
+# The inserted rows are NOTIFY'd as lists of NOTIFY_CHUNK positions,
+# which keeps each payload well under the 8000 byte limit of pg_notify().
+NOTIFY_CHUNK = 50
+
+INSERT_POSITIONS = Statement('insert_positions', f"""
+	WITH added AS (
+		INSERT INTO positions (resource, x, y, ip)
+		SELECT items.resource, items.x, items.y, items.ip
+		FROM unnest(%s::bigint[], %s::double precision[], %s::double precision[], %s::bigint[]) AS items(resource, x, y, ip)
+		ON CONFLICT DO NOTHING
+		RETURNING id, resource, x, y
+	), described AS (
+		SELECT added.id, added.resource, added.x, added.y, json_build_object(
+			'id', added.id, 'category', resources.category, 'resource', resources.name, 'x', added.x, 'y', added.y
+		) AS position, (row_number() OVER (ORDER BY added.id) - 1) / {NOTIFY_CHUNK} AS chunk
+		FROM added JOIN resources ON added.resource=resources.id
+	), notified AS (
+		SELECT pg_notify(%s, json_build_object('op', 'add', 'positions', json_agg(position))::text)
+		FROM described GROUP BY chunk
+	)
+	SELECT id, resource, x, y FROM described
+	WHERE (SELECT count(*) FROM notified) >= 0""")
+
+async def insert_positions(items):
+	"""
+	Inserts [(resource id, x, y, ip id), ...] in a single statement, NOTIFYing the inserted rows.
+	Returns the inserted rows as (id, resource (id), x, y), items that collided
+	with an existing position are left out.
+	"""
+	resources, xs, ys, ips = zip(*items)
+	added = await db.execute(INSERT_POSITIONS, (list(resources), list(xs), list(ys), list(ips), CHANNEL))
+
+	if added:
+		snapshot.bump()
+
+	for row in added:
+		positions_index.add(catalog.names[row.resource], row.id, row.x, row.y)
+
+	return added
+
+async def flush_positions(items):
+	"""
+	Inserts queued [(resource id, x, y, ip id, reservation), ...] and returns the new position id
+	for every item, or None if it was a duplicate. Items were checked when they were submitted,
+	but positions from other workers might have arrived since, so they're checked again
+	against the index and against each other before inserting.
+	"""
+	batch = PositionIndex()
+	accepted = []
+	added = {}
+	try:
+		for resource, x, y, ip, reservation in items:
+			name = catalog.names.get(resource)
+			if positions_index.near(name, x, y, config.dedupe.radius, exclude=reservation) is not None:
+				continue
+			if batch.near(name, x, y, config.dedupe.radius) is not None:
+				continue
+
+			batch.add(name, len(accepted), x, y)
+			accepted.append((resource, x, y, ip))
+
+		if accepted:
+			added = {(row.resource, row.x, row.y) : row.id for row in await insert_positions(accepted)}
+	finally:
+		# Inserted positions are in the index under their real id by now
+		for resource, x, y, ip, reservation in items:
+			positions_index.remove(catalog.names.get(resource), reservation)
+
+	return [added.get((resource, x, y)) for resource, x, y, ip, reservation in items]
+
+# Optional write-behind mode for PUT /api/resources/{resource}, submissions
+# are queued and inserted in batches by flush_positions().
+writebehind = WriteBehind(
+	flush=flush_positions,
+	batch_size=config.writebehind.batch_size,
+	interval=config.writebehind.flush_interval_ms / 1000,
+	max_queue=config.writebehind.max_queue
+)
+
+def duplicate_position(existing):
+	return JSONResponse(
+		status_code=status.HTTP_409_CONFLICT,
+		content={
+			'error': 'There is already a position of this resource right there',
+			# Positions that are still being inserted only have a (negative) reservation id
+			'id': existing if existing is not None and existing > 0 else None
+		}
+	)
+
+INSERT_POSITION = Statement('insert_position', """
+	WITH added AS (
+		INSERT INTO positions (resource, x, y, ip) VALUES(%s, %s, %s, %s)
+		RETURNING id, x, y
+	)
+	SELECT added.id, pg_notify(%s, json_build_object('op', 'add', 'positions', json_build_array(json_build_object(
+		'id', added.id, 'category', %s::text, 'resource', %s::text, 'x', added.x, 'y', added.y
+	)))::text)
+	FROM added""", mode='one')
+
+RESOURCE_POSITIONS = Statement('resource_positions', "SELECT x, y FROM positions WHERE resource=%s")
+
 @app.put("/api/resources/{resource}")
-def add_resource(resource :str, pos :Position, request: Request, X_Real_IP: str|None = Header(None)):
+async def add_resource(resource :str, pos :Position, request: Request, durable :bool = False, X_Real_IP: str|None = Header(None)):
+	"""
+	Adds a position. In write-behind mode the submission is queued and answered with
+	202 right away, unless `durable` is given in which case it's answered once it's been inserted.
+	"""
 	try:
 		ipaddress.ip_address(request.client.host or X_Real_IP)
 		validate_resource(resource)
@@ -88,78 +618,167 @@ def add_resource(resource :str, pos :Position, request: Request, X_Real_IP: str|
 
 	ip_hash = hashlib.sha256(bytes(request.client.host or X_Real_IP, 'UTF-8')).hexdigest()
 
-	db.query("INSERT INTO ip_addresses (ip, blocked) VALUES(%s, false) ON CONFLICT DO NOTHING", (ip_hash, ))
-	ip_info = db.query("SELECT id, blocked FROM ip_addresses WHERE ip=%s", (ip_hash, ))
+	if (rejection := await admit('put', ip_hash)):
+		return rejection
 
-	if not ip_info or ip_info.get('blocked'):
-		return {'error': 'IP has been blocked due to spammish behavior'}
+	if (existing := positions_index.near(resource, pos.x, pos.y, config.dedupe.radius)) is not None:
+		return duplicate_position(existing)
+
+	# Reserved before anything is awaited, so that concurrent submissions see this one
+	reservation = positions_index.reserve(resource, pos.x, pos.y) if config.dedupe.radius > 0 else None
+	try:
+		ip_info = await ipcache.lookup(db, ip_hash)
+
+		if not ip_info or ip_info.blocked:
+			return {'error': 'IP has been blocked due to spammish behavior'}
+
+		if config.writebehind.enabled:
+			if (future := writebehind.submit((catalog.id_of(resource), pos.x, pos.y, ip_info.id, reservation), detached=not durable)) is None:
+				return JSONResponse(
+					status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+					content={'error': 'Too many pending submissions, try again shortly'},
+					headers={'Retry-After' : '1'}
+				)
+
+			# From here on flush_positions() releases the reservation
+			reservation = None
+
+			if not durable:
+				return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={'status': 'queued'})
+
+			if await future is None:
+				return duplicate_position(None)
+		else:
+			added = await db.execute(
+				INSERT_POSITION,
+				(catalog.id_of(resource), pos.x, pos.y, ip_info.id, CHANNEL, catalog.category_of(resource), resource)
+			)
+			positions_index.add(resource, added.id, pos.x, pos.y)
+			snapshot.bump()
+	finally:
+		positions_index.remove(resource, reservation)
 
-	db.query("INSERT INTO positions (resource, x, y, ip) VALUES((SELECT id FROM resources WHERE name=%s), %s, %s, %s)", (resource, pos.x, pos.y, ip_info.get('id')))
-	
 	return {
 		resource : {
 			'icon' : None,
-			'positions' : db.query("SELECT x, y FROM positions WHERE resource = (SELECT id FROM resources WHERE name=%s)", (resource, ), force_list=True)
+			'positions' : [{'x' : x, 'y' : y} for x, y in await db.execute(RESOURCE_POSITIONS, (catalog.id_of(resource), ))]
 		}
 	}
 
-@app.delete("/api/resources/{category}/{resource}/{identity}")
-def add_resource(category :str, resource :str, identity :int, request: Request, X_Real_IP: str|None = Header(None)):
+@app.put("/api/resources")
+async def add_resources(request: Request, items :list[dict] = Body(...), X_Real_IP: str|None = Header(None)):
+	"""
+	Bulk submission of [{"resource": ..., "x": ..., "y": ...}, ...].
+	Every item is validated on its own and the valid ones are inserted in one statement,
+	the response holds a status of accepted, duplicate or rejected for each item (in order).
+	"""
 	try:
 		ipaddress.ip_address(request.client.host or X_Real_IP)
-		validate_category(category)
-		validate_resource(resource)
-		validate_resource_id(category, resource, identity)
 	except ValueError as error:
 		print(error)
 		return {'error': 'Invalid data sent to server'}
 
-	ip_hash = hashlib.sha256(bytes(request.client.host or X_Real_IP, 'UTF-8')).hexdigest()
+	# Configuration.validate_bulk() keeps max_items within the rate limit burst,
+	# so anything that passes here can also pass admit() eventually
+	if len(items) > config.bulk.max_items:
+		return JSONResponse(
+			status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+			content={'error': f'Too many items, at most {config.bulk.max_items} can be submitted at once'}
+		)
 
-	db.query("INSERT INTO ip_addresses (ip, blocked) VALUES(%s, false) ON CONFLICT DO NOTHING", (ip_hash, ))
-	ip_info = db.query("SELECT id, blocked FROM ip_addresses WHERE ip=%s", (ip_hash, ))
+	ip_hash = hashlib.sha256(bytes(request.client.host or X_Real_IP, 'UTF-8')).hexdigest()
 
-	if not ip_info or ip_info.get('blocked'):
-		return {'error': 'IP has been blocked due to spammish behavior'}
+	if (rejection := await admit('bulk', ip_hash, cost=max(len(items), 1))):
+		return rejection
 
-	db.query("""
-		INSERT INTO node_removal (resource, ip)
-		VALUES(
-			(
-				SELECT positions.id FROM resources, positions
-				WHERE positions.resource=resources.id
-				AND resources.name=%s
-				AND resources.category=%s
-				AND positions.id=%s
-			),
-			%s
-		)""",
-		(resource, category, identity, ip_info.get('id'))
-	)
+	results :list[dict|None] = [None] * len(items)
+	pending = {}
+	# Accepted items are reserved in the index right away, which catches near-duplicates
+	# within the submission itself as well as those of concurrent submissions
+	reservations = []
+	for index, item in enumerate(items):
+		try:
+			position = BulkPosition(**item)
+			validate_resource(position.resource)
+		except (pydantic.ValidationError, ValueError, TypeError) as error:
+			results[index] = {'status' : 'rejected', 'error' : str(error)}
+			continue
 
-	if (result := db.query(
-		"""
-		SELECT node_removal.resource, resources.name, resources.category FROM node_removal, positions, resources
-		WHERE node_removal.resource=(SELECT id FROM positions WHERE positions.id=%s)
-		AND positions.id=%s
-		AND resources.id=(SELECT positions.resource FROM positions WHERE positions.id=%s)
-		""",
-		(identity, identity, identity), force_list=True)
-	):
-		if len(result) >= 4 or (request.client.host or X_Real_IP) == '127.0.0.1':
-			print(f"Removing resource because: Reports is {len(result) >= 4}>=4 or Admin=={(request.client.host or X_Real_IP) == '127.0.0.1'}")
-			db.query("""
-				DELETE FROM positions WHERE positions.id=%s
-			""", (result[0]['resource'], ))
-			return {
-				"status": "resource deleted"
-			}
+		key = (position.resource, position.x, position.y)
+		if key in pending:
+			results[index] = {'status' : 'duplicate'}
+		elif (existing := positions_index.near(*key, config.dedupe.radius)) is not None:
+			results[index] = {'status' : 'duplicate', 'id' : existing} if existing > 0 else {'status' : 'duplicate'}
 		else:
-			return {
-				"status": "resource deletion added, waiting for moderator approval"
-			}
+			pending[key] = index
+			if config.dedupe.radius > 0:
+				reservations.append((position.resource, positions_index.reserve(*key)))
+
+	try:
+		if pending:
+			ip_info = await ipcache.lookup(db, ip_hash)
+
+			if not ip_info or ip_info.blocked:
+				return {'error': 'IP has been blocked due to spammish behavior'}
+
+			added = await insert_positions([
+				(catalog.id_of(resource), x, y, ip_info.id) for resource, x, y in pending
+			])
+
+			for row in added:
+				results[pending.pop((catalog.names[row.resource], row.x, row.y))] = {'status' : 'accepted', 'id' : row.id}
+
+			# Whatever is left collided with positions already in the database
+			for index in pending.values():
+				results[index] = {'status' : 'duplicate'}
+	finally:
+		for resource, reservation in reservations:
+			positions_index.remove(resource, reservation)
 
 	return {
-		"status": "error"
+		'accepted' : sum(1 for result in results if result is not None and result['status'] == 'accepted'),
+		'results' : results
 	}
 
+VOTE_REMOVAL = Statement('vote_removal', "SELECT vote_removal(%s, %s, %s, %s, %s) AS status", mode='one')
+
+@app.delete("/api/resources/{category}/{resource}/{identity}")
+async def add_resource(category :str, resource :str, identity :int, request: Request, X_Real_IP: str|None = Header(None)):
+	try:
+		ipaddress.ip_address(request.client.host or X_Real_IP)
+		validate_resource_category(category, resource)
+	except ValueError as error:
+		print(error)
+		return {'error': 'Invalid data sent to server'}
+
+	ip_hash = hashlib.sha256(bytes(request.client.host or X_Real_IP, 'UTF-8')).hexdigest()
+
+	if (rejection := await admit('delete', ip_hash)):
+		return rejection
+
+	ip_info = await ipcache.lookup(db, ip_hash)
+
+	if not ip_info or ip_info.blocked:
+		return {'error': 'IP has been blocked due to spammish behavior'}
+
+	# Registers the vote, and deletes the position (with tombstone and NOTIFY)
+	# if it reached the threshold, all in one statement. See migration 7.
+	admin = (request.client.host or X_Real_IP) == '127.0.0.1'
+	result = await db.execute(
+		VOTE_REMOVAL,
+		(identity, catalog.id_of(resource), ip_info.id, config.voting.threshold, admin)
+	)
+
+	if result.status == 'deleted':
+		print(f"Removed resource {identity} because: Reports>={config.voting.threshold} or Admin=={admin}")
+		snapshot.bump()
+		return {
+			"status": "resource deleted"
+		}
+	elif result.status == 'pending':
+		return {
+			"status": "resource deletion added, waiting for moderator approval"
+		}
+
+	print(f"Resource ID does not exist")
+	return {'error': 'Invalid data sent to server'}
@@ -0,0 +1,35 @@
+import dataclasses
+
+from .database.statements import Statement
+
+SELECT_RESOURCES = Statement('select_resources', "SELECT id, name, category FROM resources ORDER BY id")
+
+@dataclasses.dataclass
+class ResourceCatalog:
+	"""
+	In-memory copy of the resources table, so that validating a resource
+	or resolving its id never needs a query or a scan over every category.
+	Call refresh() whenever the resources table might have changed.
+	"""
+	ids :dict = dataclasses.field(default_factory=dict)
+	names :dict = dataclasses.field(default_factory=dict)
+	categories :dict = dataclasses.field(default_factory=dict)
+	resources :dict = dataclasses.field(default_factory=dict)
+
+	async def refresh(self, db):
+		ids, names, categories, resources = {}, {}, {}, {}
+		for identity, name, category in await db.execute(SELECT_RESOURCES):
+			ids[name] = identity
+			names[identity] = name
+			categories[name] = category
+			resources.setdefault(category, []).append(name)
+
+		# Swap everything in at once so readers never see a half built catalog
+		self.ids, self.names, self.categories = ids, names, categories
+		self.resources = {category : tuple(members) for category, members in resources.items()}
+
+	def category_of(self, resource :str):
+		return self.categories.get(resource)
+
+	def id_of(self, resource :str):
+		return self.ids.get(resource)
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import select
+
+def seed(args):
+	from .app import database
+
+	if database.seed(force=args.force):
+		print("Seed data applied")
+	else:
+		print("Seed data is already up to date, skipping (use --force to apply anyway)")
+
+def compact(args):
+	from .app import NOTIFY_CHUNK, config, database
+	from .database.postgresql import CHANNEL
+	from .dedupe import find_near_duplicates
+
+	radius = args.radius if args.radius is not None else config.dedupe.radius
+	rows = database.query("SELECT id, resource, x, y FROM positions ORDER BY id", force_list=True) or []
+	duplicates = find_near_duplicates(rows, radius)
+
+	print(f"Found {len(duplicates)} of {len(rows)} positions within {radius} of an older position of the same resource")
+	if args.dry_run or not duplicates:
+		return
+
+	# NOTIFY'd the same way as a voted deletion, /api/sync picks it up from position_changes
+	database.query("""
+		WITH removed AS (
+			DELETE FROM positions WHERE id = ANY(%s) RETURNING id, resource
+		), described AS (
+			SELECT json_build_object(
+				'id', removed.id, 'category', resources.category, 'resource', resources.name
+			) AS position, (row_number() OVER (ORDER BY removed.id) - 1) / %s AS chunk
+			FROM removed JOIN resources ON removed.resource=resources.id
+		)
+		SELECT pg_notify(%s, json_build_object('op', 'remove', 'positions', json_agg(position))::text)
+		FROM described GROUP BY chunk""",
+		(duplicates, NOTIFY_CHUNK, CHANNEL),
+		force_list=True
+	)
+	print(f"Removed {len(duplicates)} positions")
+
+def wait_for_change(connection, timeout):
+	"""
+	Blocks until something is NOTIFY'd on the LISTEN connection or `timeout` passes.
+	"""
+	if select.select([connection], [], [], timeout) == ([], [], []):
+		return
+
+	connection.poll()
+	connection.notifies.clear()
+
+def export(args):
+	import psycopg2
+
+	from .app import build_map, catalog, database, db
+	from .database.postgresql import CHANNEL
+	from .export import export as write_export
+	from .snapshot import MapEntry
+
+	async def run():
+		await db.open()
+		connection = None
+		etag = None
+		try:
+			while True:
+				await catalog.refresh(db)
+				entry = MapEntry.build(0, await build_map())
+				if entry.etag != etag:
+					manifest = write_export(entry, args.directory, grace=args.grace)
+					etag = entry.etag
+					print(f"Exported {manifest['map']} to {args.directory}")
+
+				if not args.watch:
+					break
+
+				if connection is None or connection.closed:
+					try:
+						connection = database.dedicated_connection()
+						with connection.cursor() as cur:
+							cur.execute(f"LISTEN {CHANNEL}")
+					except Exception as error:
+						# Without LISTEN we still poll every --interval seconds
+						print(f"Could not LISTEN for changes, polling instead: {error}")
+						connection = None
+
+				if connection is None:
+					await asyncio.sleep(args.interval)
+				else:
+					try:
+						await asyncio.to_thread(wait_for_change, connection, args.interval)
+						# Let a burst of changes settle into one export
+						await asyncio.sleep(args.debounce)
+						connection.poll()
+						connection.notifies.clear()
+					except (psycopg2.Error, OSError) as error:
+						# Reconnected on the next round, the export in between picks up anything missed
+						print(f"Lost connection to the LISTEN channel: {error}")
+						connection.close()
+		finally:
+			if connection is not None:
+				connection.close()
+			await db.close()
+
+	try:
+		asyncio.run(run())
+	except KeyboardInterrupt:
+		pass
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog='coreborn', description='Coreborn Map API')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	seed_parser = commands.add_parser('seed', help='Insert the starting resources and positions (once per deployment)')
+	seed_parser.add_argument('--force', action='store_true', default=False, help='Apply the seed data even if its checksum is unchanged')
+	seed_parser.set_defaults(func=seed)
+
+	compact_parser = commands.add_parser('compact', help='Remove positions that are near-duplicates of older ones')
+	compact_parser.add_argument('--radius', type=float, default=None, help='Distance in normalized map units (defaults to [dedupe] radius)')
+	compact_parser.add_argument('--dry-run', action='store_true', default=False, help='Only report what would be removed')
+	compact_parser.set_defaults(func=compact)
+
+	export_parser = commands.add_parser('export', help='Write the map as static (content hashed and precompressed) files for a web server or CDN')
+	export_parser.add_argument('directory', help='Directory to write the files to')
+	export_parser.add_argument('--watch', action='store_true', default=False, help='Keep running and export again whenever the data changes')
+	export_parser.add_argument('--interval', type=float, default=60, help='With --watch, seconds between checks when no change is NOTIFY\'d')
+	export_parser.add_argument('--debounce', type=float, default=1, help='With --watch, seconds to wait for more changes before exporting')
+	export_parser.add_argument('--grace', type=float, default=3600, help='Seconds to keep hashed files of earlier exports around')
+	export_parser.set_defaults(func=export)
+
+	args = parser.parse_args(argv)
+	args.func(args)
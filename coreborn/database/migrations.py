@@ -0,0 +1,335 @@
+"""
+Versioned schema migrations.
+
+Each migration is a (version, name, statements) tuple and is applied exactly once,
+in order, inside its own transaction together with its schema_version row.
+Statements are written to be idempotent as well, so that databases created
+before the migrations existed (by the old CREATE TABLE IF NOT EXISTS setup)
+are brought up to date without errors.
+"""
+
+# Arbitrary but fixed key, so that only one worker migrates at a time.
+ADVISORY_LOCK = 0x636f7265
+
+def add_constraint(table, name, definition):
+	return f"""
+		DO $$ BEGIN
+			IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid='{table}'::regclass AND conname='{name}') THEN
+				ALTER TABLE {table} ADD CONSTRAINT {name} {definition};
+			END IF;
+		END $$"""
+
+def add_primary_key(table):
+	return f"""
+		DO $$ BEGIN
+			IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid='{table}'::regclass AND contype='p') THEN
+				ALTER TABLE {table} ADD PRIMARY KEY (id);
+			END IF;
+		END $$"""
+
+MIGRATIONS = [
+	(1, 'Initial tables', [
+		"""CREATE TABLE IF NOT EXISTS ip_addresses (
+			id BIGSERIAL,
+			ip VARCHAR(64) NOT NULL UNIQUE,
+			blocked BOOL,
+			added TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+		)""",
+		"""CREATE TABLE IF NOT EXISTS resources (
+			id SERIAL,
+			name VARCHAR NOT NULL UNIQUE,
+			category VARCHAR NOT NULL,
+			icon VARCHAR,
+			added TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+		)""",
+		"""CREATE TABLE IF NOT EXISTS positions (
+			id BIGSERIAL,
+			resource BIGINT NOT NULL,
+			x DOUBLE PRECISION NOT NULL,
+			y DOUBLE PRECISION NOT NULL,
+			ip BIGINT NOT NULL,
+			added TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+			UNIQUE(resource, x, y)
+		)""",
+		"""CREATE TABLE IF NOT EXISTS node_removal (
+			id BIGSERIAL,
+			resource BIGINT NOT NULL,
+			ip BIGINT NOT NULL,
+			added TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+			UNIQUE(resource, ip)
+		)""",
+		# Deleted positions leave a tombstone behind so that clients
+		# syncing incrementally (/api/sync) learn about the removal.
+		"""CREATE TABLE IF NOT EXISTS position_tombstones (
+			id BIGSERIAL,
+			position BIGINT NOT NULL,
+			resource BIGINT NOT NULL,
+			removed TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+		)""",
+	]),
+	(2, 'Primary keys', [
+		add_primary_key('ip_addresses'),
+		add_primary_key('resources'),
+		add_primary_key('positions'),
+		add_primary_key('node_removal'),
+		add_primary_key('position_tombstones'),
+	]),
+	(3, 'Foreign keys', [
+		# Votes for positions that have since been deleted are meaningless,
+		# and would otherwise stop the foreign key from being created.
+		"""DELETE FROM node_removal WHERE NOT EXISTS (SELECT 1 FROM positions WHERE positions.id=node_removal.resource)""",
+		add_constraint('node_removal', 'node_removal_resource_fkey', 'FOREIGN KEY (resource) REFERENCES positions (id) ON DELETE CASCADE'),
+		# IP addresses are cleared out after a while, so existing votes and positions may
+		# well point at ip rows that are gone. Those are not validated (NOT VALID)
+		# rather than risk deleting anything, new rows are checked regardless.
+		add_constraint('node_removal', 'node_removal_ip_fkey', 'FOREIGN KEY (ip) REFERENCES ip_addresses (id) NOT VALID'),
+		add_constraint('positions', 'positions_resource_fkey', 'FOREIGN KEY (resource) REFERENCES resources (id) NOT VALID'),
+		add_constraint('positions', 'positions_ip_fkey', 'FOREIGN KEY (ip) REFERENCES ip_addresses (id) NOT VALID'),
+	]),
+	(4, 'Hot path indexes', [
+		# positions(resource), node_removal(resource), resources(name) and ip_addresses(ip)
+		# are already covered by their UNIQUE constraints (as the leading column).
+		"""CREATE INDEX IF NOT EXISTS positions_ip_idx ON positions (ip)""",
+		"""CREATE INDEX IF NOT EXISTS node_removal_ip_idx ON node_removal (ip)""",
+		"""CREATE INDEX IF NOT EXISTS resources_category_idx ON resources (category)""",
+	]),
+	(5, 'Seed state', [
+		# Checksum of the seed data last applied by Database.seed()
+		"""CREATE TABLE IF NOT EXISTS seed_state (
+			name VARCHAR PRIMARY KEY,
+			checksum VARCHAR(64) NOT NULL,
+			applied TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+		)""",
+	]),
+	(6, 'Notify on blocked changes', [
+		# Workers cache the blocked flag per ip, this tells them when it changes.
+		# The channel matches coreborn.database.postgresql.CHANNEL
+		"""CREATE OR REPLACE FUNCTION notify_ip_blocked() RETURNS trigger AS $$
+		BEGIN
+			PERFORM pg_notify('coreborn_positions', json_build_object('op', 'ip', 'ip', NEW.ip)::text);
+			RETURN NEW;
+		END
+		$$ LANGUAGE plpgsql""",
+		"""DROP TRIGGER IF EXISTS ip_addresses_blocked_notify ON ip_addresses""",
+		"""CREATE TRIGGER ip_addresses_blocked_notify
+			AFTER UPDATE OF blocked ON ip_addresses
+			FOR EACH ROW WHEN (OLD.blocked IS DISTINCT FROM NEW.blocked)
+			EXECUTE FUNCTION notify_ip_blocked()""",
+	]),
+	(7, 'Removal vote counts', [
+		"""ALTER TABLE positions ADD COLUMN IF NOT EXISTS removal_votes INT NOT NULL DEFAULT 0""",
+		"""UPDATE positions SET removal_votes=votes.count
+			FROM (SELECT resource, count(*) AS count FROM node_removal GROUP BY resource) AS votes
+			WHERE positions.id=votes.resource""",
+		# Registers a removal vote (once per ip) and keeps positions.removal_votes up to date.
+		# Once the threshold is reached (or forced) the position is deleted, which leaves a tombstone,
+		# NOTIFYs the removal and cascades to its node_removal rows.
+		# Returns 'deleted', 'pending' or 'missing' (no such position of that resource).
+		"""CREATE OR REPLACE FUNCTION vote_removal(p_position BIGINT, p_resource BIGINT, p_ip BIGINT, p_threshold INT, p_force BOOL)
+		RETURNS TEXT AS $$
+		DECLARE
+			votes INT;
+		BEGIN
+			INSERT INTO node_removal (resource, ip)
+			SELECT id, p_ip FROM positions WHERE id=p_position AND resource=p_resource
+			ON CONFLICT DO NOTHING;
+
+			IF FOUND THEN
+				UPDATE positions SET removal_votes=removal_votes + 1 WHERE id=p_position RETURNING removal_votes INTO votes;
+			ELSE
+				SELECT removal_votes INTO votes FROM positions WHERE id=p_position AND resource=p_resource;
+			END IF;
+
+			IF votes IS NULL THEN
+				RETURN 'missing';
+			END IF;
+
+			IF votes >= p_threshold OR p_force THEN
+				DELETE FROM positions WHERE id=p_position;
+				IF FOUND THEN
+					INSERT INTO position_tombstones (position, resource) VALUES(p_position, p_resource);
+					PERFORM pg_notify('coreborn_positions', json_build_object(
+						'op', 'remove', 'id', p_position, 'category', resources.category, 'resource', resources.name
+					)::text) FROM resources WHERE resources.id=p_resource;
+				END IF;
+
+				RETURN 'deleted';
+			END IF;
+
+			RETURN 'pending';
+		END
+		$$ LANGUAGE plpgsql""",
+	]),
+	(8, 'Keep positions and votes when their ip is cleared out', [
+		# Clearing out an ip_addresses row detaches its positions and votes (ip becomes NULL)
+		# rather than failing on the foreign keys. Positions without an ip stay visible,
+		# only those of a blocked ip are hidden.
+		"""ALTER TABLE positions ALTER COLUMN ip DROP NOT NULL""",
+		"""ALTER TABLE node_removal ALTER COLUMN ip DROP NOT NULL""",
+		"""ALTER TABLE positions DROP CONSTRAINT IF EXISTS positions_ip_fkey""",
+		"""ALTER TABLE positions ADD CONSTRAINT positions_ip_fkey FOREIGN KEY (ip) REFERENCES ip_addresses (id) ON DELETE SET NULL NOT VALID""",
+		"""ALTER TABLE node_removal DROP CONSTRAINT IF EXISTS node_removal_ip_fkey""",
+		"""ALTER TABLE node_removal ADD CONSTRAINT node_removal_ip_fkey FOREIGN KEY (ip) REFERENCES ip_addresses (id) ON DELETE SET NULL NOT VALID""",
+	]),
+	(9, 'Commit ordered position changes', [
+		# Every change in what the map shows, for /api/sync. Rows are ordered by the id of the
+		# transaction that wrote them (txid) rather than by a sequence, because sequence values are
+		# handed out before commit and a cursor based on them skips rows that commit late.
+		# A transaction id is only read once no older transaction is still running (see SYNC_HORIZON).
+		"""CREATE TABLE IF NOT EXISTS position_changes (
+			id BIGSERIAL PRIMARY KEY,
+			txid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+			position BIGINT NOT NULL,
+			resource BIGINT NOT NULL,
+			op VARCHAR(6) NOT NULL,
+			x DOUBLE PRECISION,
+			y DOUBLE PRECISION
+		)""",
+		"""CREATE INDEX IF NOT EXISTS position_changes_txid_idx ON position_changes (txid)""",
+		"""CREATE OR REPLACE FUNCTION record_position_change() RETURNS trigger AS $$
+		BEGIN
+			IF TG_OP = 'INSERT' THEN
+				-- Positions submitted from a blocked ip are never shown, so there is nothing to sync
+				INSERT INTO position_changes (position, resource, op, x, y)
+				SELECT NEW.id, NEW.resource, 'add', NEW.x, NEW.y
+				WHERE NOT EXISTS (SELECT 1 FROM ip_addresses WHERE id=NEW.ip AND blocked IS TRUE);
+				RETURN NEW;
+			END IF;
+
+			INSERT INTO position_changes (position, resource, op) VALUES(OLD.id, OLD.resource, 'remove');
+			RETURN OLD;
+		END
+		$$ LANGUAGE plpgsql""",
+		"""DROP TRIGGER IF EXISTS positions_record_change ON positions""",
+		"""CREATE TRIGGER positions_record_change
+			AFTER INSERT OR DELETE ON positions
+			FOR EACH ROW EXECUTE FUNCTION record_position_change()""",
+		# (Un)blocking an ip hides or shows all of its positions at once
+		"""CREATE OR REPLACE FUNCTION notify_ip_blocked() RETURNS trigger AS $$
+		BEGIN
+			IF (OLD.blocked IS TRUE) IS DISTINCT FROM (NEW.blocked IS TRUE) THEN
+				INSERT INTO position_changes (position, resource, op, x, y)
+				SELECT id, resource, CASE WHEN NEW.blocked THEN 'remove' ELSE 'add' END, x, y
+				FROM positions WHERE ip=NEW.id;
+			END IF;
+
+			PERFORM pg_notify('coreborn_positions', json_build_object('op', 'ip', 'ip', NEW.ip)::text);
+			RETURN NEW;
+		END
+		$$ LANGUAGE plpgsql""",
+		# Removals are recorded by the trigger above now, the tombstones are no longer read
+		"""CREATE OR REPLACE FUNCTION vote_removal(p_position BIGINT, p_resource BIGINT, p_ip BIGINT, p_threshold INT, p_force BOOL)
+		RETURNS TEXT AS $$
+		DECLARE
+			votes INT;
+		BEGIN
+			INSERT INTO node_removal (resource, ip)
+			SELECT id, p_ip FROM positions WHERE id=p_position AND resource=p_resource
+			ON CONFLICT DO NOTHING;
+
+			IF FOUND THEN
+				UPDATE positions SET removal_votes=removal_votes + 1 WHERE id=p_position RETURNING removal_votes INTO votes;
+			ELSE
+				SELECT removal_votes INTO votes FROM positions WHERE id=p_position AND resource=p_resource;
+			END IF;
+
+			IF votes IS NULL THEN
+				RETURN 'missing';
+			END IF;
+
+			IF votes >= p_threshold OR p_force THEN
+				DELETE FROM positions WHERE id=p_position;
+				IF FOUND THEN
+					PERFORM pg_notify('coreborn_positions', json_build_object(
+						'op', 'remove', 'id', p_position, 'category', resources.category, 'resource', resources.name
+					)::text) FROM resources WHERE resources.id=p_resource;
+				END IF;
+
+				RETURN 'deleted';
+			END IF;
+
+			RETURN 'pending';
+		END
+		$$ LANGUAGE plpgsql""",
+		"""DROP TABLE IF EXISTS position_tombstones""",
+	]),
+	(10, 'Position change retention', [
+		"""ALTER TABLE position_changes ADD COLUMN IF NOT EXISTS recorded TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP""",
+		# 'pruned' is the txid below which position_changes have been deleted,
+		# /api/sync cursors older than that can only be answered with a full resync.
+		"""CREATE TABLE IF NOT EXISTS sync_state (
+			name VARCHAR PRIMARY KEY,
+			horizon xid8 NOT NULL,
+			updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+		)""",
+		"""INSERT INTO sync_state (name, horizon) VALUES('pruned', '0') ON CONFLICT DO NOTHING""",
+		# Deletes the changes recorded more than p_keep ago and moves the pruned horizon up to
+		# the oldest change that's kept, returns the number of deleted rows. Changes are ordered
+		# by txid and only roughly by time, so a change is only deleted once every change with
+		# a lower txid is old enough as well. The horizon never passes a transaction that's still running.
+		"""CREATE OR REPLACE FUNCTION prune_position_changes(p_keep INTERVAL) RETURNS BIGINT AS $$
+		DECLARE
+			last_pruned xid8;
+			kept_from xid8;
+			deleted BIGINT;
+		BEGIN
+			-- Serializes workers pruning at the same time
+			SELECT horizon INTO last_pruned FROM sync_state WHERE name='pruned' FOR UPDATE;
+
+			SELECT txid INTO kept_from FROM position_changes
+			WHERE recorded >= CURRENT_TIMESTAMP - p_keep
+			ORDER BY txid LIMIT 1;
+
+			kept_from := LEAST(COALESCE(kept_from, pg_snapshot_xmin(pg_current_snapshot())), pg_snapshot_xmin(pg_current_snapshot()));
+			IF kept_from <= last_pruned THEN
+				RETURN 0;
+			END IF;
+
+			DELETE FROM position_changes WHERE txid < kept_from;
+			GET DIAGNOSTICS deleted = ROW_COUNT;
+			UPDATE sync_state SET horizon=kept_from, updated=CURRENT_TIMESTAMP WHERE name='pruned';
+			RETURN deleted;
+		END
+		$$ LANGUAGE plpgsql""",
+	]),
+]
+
+def migrate(connection, migrations=MIGRATIONS):
+	"""
+	Applies every migration newer than the current schema version,
+	returns a list of the versions that were applied.
+	"""
+	applied = []
+	autocommit = connection.autocommit
+	connection.autocommit = False
+	try:
+		with connection.cursor() as cur:
+			cur.execute("SELECT pg_advisory_xact_lock(%s)", (ADVISORY_LOCK, ))
+			cur.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+				version INT PRIMARY KEY,
+				name VARCHAR NOT NULL,
+				applied TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+			)""")
+			connection.commit()
+
+			for version, name, statements in sorted(migrations, key=lambda migration: migration[0]):
+				cur.execute("SELECT pg_advisory_xact_lock(%s)", (ADVISORY_LOCK, ))
+				cur.execute("SELECT 1 FROM schema_version WHERE version=%s", (version, ))
+				if cur.fetchone():
+					connection.commit()
+					continue
+
+				print(f"Applying schema migration {version}: {name}")
+				for statement in statements:
+					cur.execute(statement)
+
+				cur.execute("INSERT INTO schema_version (version, name) VALUES(%s, %s)", (version, name))
+				connection.commit()
+				applied.append(version)
+	except:
+		connection.rollback()
+		raise
+	finally:
+		connection.autocommit = autocommit
+
+	return applied
@@ -1,9 +1,37 @@
+import asyncio
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
+import contextlib
 import dataclasses
 import hashlib
+import json
+import threading
 
-from ..startup import init_data
+from .migrations import migrate
+from .statements import Statement
+from ..startup import init_data, load_seed_positions, seed_checksum
+
+# Arbitrary but fixed key, so that only one process seeds at a time.
+SEED_LOCK = 0x73656564
+
+# Postgres channel that changes are NOTIFY'd on, payloads are JSON
+# objects with an "op" of "add", "remove", "catalog" (resources changed)
+# or "ip" (an ip_addresses row was blocked or unblocked).
+# Adds and removes carry either a single position (id, category, resource...)
+# or a "positions" list of them when a statement changed many at once.
+CHANNEL = 'coreborn_positions'
+
+class PreparingConnection(psycopg2.extensions.connection):
+	"""
+	Remembers which Statements have been PREPARE'd on it, as prepared statements
+	only exist within the session they were created in.
+	"""
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.prepared = set()
 
 @dataclasses.dataclass
 class Database:
@@ -12,20 +40,42 @@ class Database:
 	password :str = None
 	host :str = '127.0.0.1'
 	port :int = 5432
-	connection :psycopg2.extensions.connection = None
+	min_connections :int = 1
+	max_connections :int = 10
+	checkout_timeout :float = 10
+	pool :psycopg2.pool.ThreadedConnectionPool = None
 
 	def __post_init__(self):
-		if self.connection is None:
+		# ThreadedConnectionPool raises PoolError when exhausted,
+		# so we guard it with a semaphore to make callers wait for a free connection instead.
+		self._available = threading.BoundedSemaphore(self.max_connections)
+		if self.pool is None:
 			self.reconnect()
 
 	def reconnect(self):
-		if self.connection:
+		if self.pool:
 			try:
-				self.connection.close()
+				self.pool.closeall()
 			except:
 				pass
 
-		self.connection = psycopg2.connect(
+		self.pool = psycopg2.pool.ThreadedConnectionPool(
+			self.min_connections,
+			self.max_connections,
+			dbname=self.dbname,
+			user=self.user,
+			password=self.password,
+			host=self.host,
+			port=self.port,
+			connect_timeout=3,
+			connection_factory=PreparingConnection
+		)
+
+	def dedicated_connection(self):
+		"""
+		Opens a connection outside of the pool, for long lived use such as LISTEN.
+		"""
+		connection = psycopg2.connect(
 			dbname=self.dbname,
 			user=self.user,
 			password=self.password,
@@ -33,95 +83,234 @@ class Database:
 			port=self.port,
 			connect_timeout=3
 		)
-		self.connection.autocommit = True
+		connection.autocommit = True
+		return connection
+
+	def close(self):
+		if self.pool:
+			self.pool.closeall()
 
 	@property
 	def connected(self):
-		if self.connection is not None and self.connection.closed == 0:
+		if self.pool is not None and not self.pool.closed:
 			return True
 
 		return False
 
-	def query(self, query, values=None, force_list=False):
-		#print(query, values)
+	@staticmethod
+	def healthy(connection):
+		if connection.closed:
+			return False
+
+		try:
+			# poll() reads whatever is pending on the socket without a round trip,
+			# which is enough to notice connections the server has hung up on.
+			connection.poll()
+		except (psycopg2.OperationalError, psycopg2.InterfaceError):
+			return False
+
+		return connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+	@contextlib.contextmanager
+	def connection(self):
+		"""
+		Checks out a healthy connection from the pool for the duration of the with-block.
+		Broken connections are discarded and replaced rather than handed out.
+		"""
 		if not self.connected:
 			self.reconnect()
 
-		with self.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-			cur.execute(query, values)
+		if not self._available.acquire(timeout=self.checkout_timeout):
+			raise psycopg2.pool.PoolError(f"No database connection available within {self.checkout_timeout}s")
 
-			if cur.rowcount:
-				try:
-					data = [dict(item) for item in cur.fetchall()]
-					if cur.rowcount == 1 and force_list is False:
-						return data[0]
-					else:
-						return data
-				except psycopg2.ProgrammingError:
-					# INSERT etc will trigger a rowcount (good), but won't have any results to return (good)
-					return True
+		try:
+			connection = self.pool.getconn()
+			while not self.healthy(connection):
+				self.pool.putconn(connection, close=True)
+				connection = self.pool.getconn()
+
+			connection.autocommit = True
+
+			broken = False
+			try:
+				yield connection
+			except (psycopg2.OperationalError, psycopg2.InterfaceError):
+				broken = connection.closed != 0
+				raise
+			finally:
+				self.pool.putconn(connection, close=broken)
+		finally:
+			self._available.release()
+
+	def query(self, query, values=None, force_list=False):
+		#print(query, values)
+		with self.connection() as connection:
+			with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+				cur.execute(query, values)
+
+				if cur.rowcount:
+					try:
+						data = [dict(item) for item in cur.fetchall()]
+						if cur.rowcount == 1 and force_list is False:
+							return data[0]
+						else:
+							return data
+					except psycopg2.ProgrammingError:
+						# INSERT etc will trigger a rowcount (good), but won't have any results to return (good)
+						return True
 
 		return None
 
-	def init(self):
+	def execute(self, statement :Statement, values=()):
 		"""
-		This is a helper function to spawn the tables and starting entries.
+		Runs a named Statement, PREPARE'ing it first if this connection hasn't seen it yet.
+		"""
+		with self.connection() as connection:
+			with connection.cursor(cursor_factory=psycopg2.extras.NamedTupleCursor) as cur:
+				if statement.name not in connection.prepared:
+					cur.execute(statement.prepare_sql)
+					connection.prepared.add(statement.name)
+
+				try:
+					cur.execute(statement.execute_sql, values)
+				except psycopg2.errors.InvalidSqlStatementName:
+					# Something (DISCARD ALL, a pooler) dropped it from the session, prepare it again
+					cur.execute(statement.prepare_sql)
+					cur.execute(statement.execute_sql, values)
+
+				if statement.mode == 'one':
+					return cur.fetchone()
+				elif statement.mode == 'many':
+					return cur.fetchall()
+
+				return cur.rowcount
+
+	def stream(self, statement :Statement, values=(), size=1000):
+		"""
+		Yields the rows of a Statement in lists of up to `size`, read through a server side cursor
+		so that the whole result is never held in memory at once.
+		"""
+		with self.connection() as connection:
+			# Server side cursors only live within a transaction
+			connection.autocommit = False
+			try:
+				with connection.cursor(name=f"stream_{statement.name}", cursor_factory=psycopg2.extras.NamedTupleCursor) as cur:
+					cur.execute(statement.sql, values)
+					while (rows := cur.fetchmany(size)):
+						yield rows
+			finally:
+				connection.rollback()
+				connection.autocommit = True
+
+	def migrate(self):
+		"""
+		Brings the schema up to date, see coreborn.database.migrations.
+		"""
+		with self.connection() as connection:
+			return migrate(connection)
+
+	def seed(self, force=False):
+		"""
+		Inserts the starting resources (coreborn.startup) and positions (coreborn/data/positions.bin).
+		This is skipped if the same seed data (by checksum) has already been applied,
+		unless force is given. Returns True if the seed data was applied.
+
 		IP addresses are obfuscated and cleared out after a short period of time to confirm with legal requirements.
 		"""
-		self.query("""CREATE TABLE IF NOT EXISTS ip_addresses (
-			id BIGSERIAL,
-			ip VARCHAR(64) NOT NULL UNIQUE,
-			blocked BOOL,
-			added TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-		)""")
-		self.query("""CREATE TABLE IF NOT EXISTS resources (
-			id SERIAL,
-			name VARCHAR NOT NULL UNIQUE,
-			category VARCHAR NOT NULL,
-			icon VARCHAR,
-			added TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-		)""")
-		self.query("""CREATE TABLE IF NOT EXISTS positions (
-			id BIGSERIAL,
-			resource BIGINT NOT NULL,
-			x DOUBLE PRECISION NOT NULL,
-			y DOUBLE PRECISION NOT NULL,
-			ip BIGINT NOT NULL,
-			added TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-			UNIQUE(resource, x, y)
-		)""")
-		self.query("""
-			CREATE TABLE IF NOT EXISTS node_removal (
-				id BIGSERIAL,
-				resource BIGINT NOT NULL,
-				ip BIGINT NOT NULL,
-				added TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-				UNIQUE(resource, ip)
-			)
-		""")
-
-		self.query("""INSERT INTO ip_addresses (ip, blocked) 
-					VALUES(%s, false) ON CONFLICT DO NOTHING""",
-			(hashlib.sha256(b'127.0.0.1').hexdigest(), )
-		)
+		checksum = seed_checksum()
+
+		with self.connection() as connection:
+			connection.autocommit = False
+			try:
+				with connection.cursor() as cur:
+					# Only one seeder at a time, the others will then see the new checksum
+					cur.execute("SELECT pg_advisory_xact_lock(%s)", (SEED_LOCK, ))
+					cur.execute("SELECT checksum FROM seed_state WHERE name='startup'")
+					if (row := cur.fetchone()) and row[0] == checksum and not force:
+						connection.commit()
+						return False
 
-		with self.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-			for category in init_data:
-				for resource, values in init_data[category].items():
-					self.query("""INSERT INTO resources (name, category)
-								VALUES(%s, %s) ON CONFLICT DO NOTHING""",
-						(resource, category)
+					# The starting positions are all attributed to 127.0.0.1
+					cur.execute("""INSERT INTO ip_addresses (ip, blocked)
+								VALUES(%s, false) ON CONFLICT (ip) DO UPDATE SET ip=EXCLUDED.ip
+								RETURNING id""",
+						(hashlib.sha256(b'127.0.0.1').hexdigest(), )
 					)
+					ip, = cur.fetchone()
 
-					cur.executemany(
-						f"""
+					psycopg2.extras.execute_values(cur,
+						"""INSERT INTO resources (name, category) VALUES %s ON CONFLICT DO NOTHING""",
+						[(resource, category) for category in init_data for resource in init_data[category]]
+					)
+
+					psycopg2.extras.execute_values(cur,
+						"""
 						INSERT INTO positions (resource, x, y, ip)
-						VALUES(
-							(SELECT id FROM resources WHERE name='{resource}'), %s, %s, %s
-						) ON CONFLICT DO NOTHING""",
-						values['positions']
+						SELECT resources.id, seed.x, seed.y, seed.ip
+						FROM (VALUES %s) AS seed(resource, x, y, ip)
+						JOIN resources ON resources.name=seed.resource
+						ON CONFLICT DO NOTHING""",
+						[
+							(resource, coordinates[index], coordinates[index + 1], ip)
+							for resource, coordinates in load_seed_positions()
+							for index in range(0, len(coordinates), 2)
+						],
+						page_size=1000
+					)
+
+					# Delivered on commit, tells running workers to refresh their resource catalog
+					cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, json.dumps({'op' : 'catalog'})))
+
+					cur.execute("""INSERT INTO seed_state (name, checksum) VALUES('startup', %s)
+								ON CONFLICT (name) DO UPDATE SET checksum=EXCLUDED.checksum, applied=CURRENT_TIMESTAMP""",
+						(checksum, )
 					)
 
+				connection.commit()
+			except:
+				connection.rollback()
+				raise
+			finally:
+				connection.autocommit = True
+
+		return True
+
+@dataclasses.dataclass
+class ThreadedDatabase:
+	"""
+	Gives the blocking Database the same awaitable interface as AsyncDatabase,
+	by running each query in a worker thread. This keeps the route handlers
+	identical regardless of which backend is configured.
+	"""
+	database :Database
+
+	async def open(self):
+		pass
+
+	async def close(self):
+		await asyncio.to_thread(self.database.close)
+
+	async def query(self, query, values=None, force_list=False):
+		return await asyncio.to_thread(self.database.query, query, values, force_list)
+
+	async def execute(self, statement :Statement, values=()):
+		return await asyncio.to_thread(self.database.execute, statement, values)
+
+	async def stream(self, statement :Statement, values=(), size=1000):
+		batches = self.database.stream(statement, values, size)
+		fetching = None
+		try:
+			while True:
+				# Shielded, as the generator can't be closed while a thread is still inside it
+				fetching = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+				if (rows := await asyncio.shield(fetching)) is None:
+					break
+				yield rows
+		finally:
+			if fetching is not None and not fetching.done():
+				await asyncio.wait({fetching})
+			await asyncio.to_thread(batches.close)
+
 # @dataclasses.dataclass
 # class Transaction:
 # 	session :Database
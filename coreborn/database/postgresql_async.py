@@ -0,0 +1,93 @@
+import dataclasses
+import psycopg
+import psycopg.conninfo
+import psycopg.rows
+import psycopg_pool
+
+from .statements import Statement
+
+@dataclasses.dataclass
+class AsyncDatabase:
+	"""
+	Asyncio counterpart to Database, backed by psycopg (v3) and its own connection pool.
+	psycopg uses the same %s placeholders as psycopg2, so queries are shared between the two.
+	"""
+	dbname :str
+	user :str
+	password :str = None
+	host :str = '127.0.0.1'
+	port :int = 5432
+	min_connections :int = 1
+	max_connections :int = 10
+	checkout_timeout :float = 10
+	pool :psycopg_pool.AsyncConnectionPool = None
+
+	def __post_init__(self):
+		if self.pool is None:
+			self.pool = psycopg_pool.AsyncConnectionPool(
+				psycopg.conninfo.make_conninfo(
+					dbname=self.dbname,
+					user=self.user,
+					password=self.password,
+					host=self.host,
+					port=self.port,
+					connect_timeout=3
+				),
+				min_size=self.min_connections,
+				max_size=self.max_connections,
+				timeout=self.checkout_timeout,
+				kwargs={'autocommit': True, 'row_factory': psycopg.rows.dict_row},
+				check=psycopg_pool.AsyncConnectionPool.check_connection,
+				open=False
+			)
+
+	async def open(self):
+		# The pool has to be opened from within the running event loop
+		await self.pool.open()
+
+	async def close(self):
+		await self.pool.close()
+
+	async def query(self, query, values=None, force_list=False):
+		async with self.pool.connection() as connection:
+			async with connection.cursor() as cur:
+				await cur.execute(query, values)
+
+				if cur.description is None:
+					# INSERT etc will have a rowcount (good), but won't have any results to return (good)
+					return True if cur.rowcount > 0 else None
+
+				data = await cur.fetchall()
+				if not data:
+					return None
+				elif len(data) == 1 and force_list is False:
+					return data[0]
+				else:
+					return data
+
+	async def execute(self, statement :Statement, values=()):
+		"""
+		Runs a named Statement, psycopg prepares it server side (once per connection) with prepare=True.
+		"""
+		async with self.pool.connection() as connection:
+			async with connection.cursor(row_factory=psycopg.rows.namedtuple_row) as cur:
+				await cur.execute(statement.sql, values or None, prepare=True)
+
+				if statement.mode == 'one':
+					return await cur.fetchone()
+				elif statement.mode == 'many':
+					return await cur.fetchall()
+
+				return cur.rowcount
+
+	async def stream(self, statement :Statement, values=(), size=1000):
+		"""
+		Yields the rows of a Statement in lists of up to `size`, read through a server side cursor
+		so that the whole result is never held in memory at once.
+		"""
+		async with self.pool.connection() as connection:
+			async with connection.transaction():
+				async with connection.cursor(name=f"stream_{statement.name}", row_factory=psycopg.rows.namedtuple_row) as cur:
+					await cur.execute(statement.sql, values or None)
+					while (rows := await cur.fetchmany(size)):
+						yield rows
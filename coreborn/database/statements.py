@@ -0,0 +1,40 @@
+import dataclasses
+import functools
+import re
+
+MODES = ('one', 'many', 'none')
+
+@dataclasses.dataclass(frozen=True)
+class Statement:
+	"""
+	A fixed, named query that the backends prepare once per connection and then only execute,
+	so that Postgres skips parsing and planning it on every call.
+	Written with the usual %s placeholders, the result depends on `mode`:
+	  one:  the first row or None
+	  many: a list of rows
+	  none: the number of affected rows
+	Rows are named tuples (row.id, row.x, ...) rather than dicts.
+	"""
+	name :str
+	sql :str
+	mode :str = 'many'
+
+	def __post_init__(self):
+		if self.mode not in MODES:
+			raise ValueError(f"Statement mode has to be one of {', '.join(MODES)}")
+
+	@functools.cached_property
+	def parameters(self):
+		return self.sql.count('%s')
+
+	@functools.cached_property
+	def prepare_sql(self):
+		# PREPARE takes positional $n parameters instead of %s
+		counter = iter(range(1, self.parameters + 1))
+		return f"PREPARE {self.name} AS " + re.sub(r'%s', lambda match: f"${next(counter)}", self.sql)
+
+	@functools.cached_property
+	def execute_sql(self):
+		if self.parameters:
+			return f"EXECUTE {self.name} ({', '.join(['%s'] * self.parameters)})"
+		return f"EXECUTE {self.name}"
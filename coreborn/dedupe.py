@@ -0,0 +1,112 @@
+import dataclasses
+import itertools
+from typing import Iterator
+
+from .database.statements import Statement
+from .spatial import SpatialGrid
+
+SELECT_VISIBLE_POSITIONS = Statement('select_visible_positions', """
+	SELECT positions.id, positions.resource, positions.x, positions.y
+	FROM positions
+	LEFT JOIN ip_addresses ON positions.ip=ip_addresses.id
+	WHERE ip_addresses.blocked IS NOT TRUE""")
+
+@dataclasses.dataclass
+class PositionIndex:
+	"""
+	A SpatialGrid per resource of every visible position, used to find an existing
+	position within a radius of a new one without scanning the positions table.
+	Loaded once with load() and then kept in sync through add()/remove(),
+	which are fed by the write paths and the LISTEN/NOTIFY changes from other workers.
+	"""
+	grids :dict = dataclasses.field(default_factory=dict)
+	_reservations :Iterator[int] = dataclasses.field(default_factory=lambda: itertools.count(-1, -1))
+	# One list of the add()/remove() calls made meanwhile per load() in progress
+	_journals :list = dataclasses.field(default_factory=list)
+
+	async def load(self, db, catalog):
+		journal = []
+		self._journals.append(journal)
+		try:
+			rows = await db.execute(SELECT_VISIBLE_POSITIONS)
+		finally:
+			self._journals.remove(journal)
+
+		grids = {}
+		for identity, resource, x, y in rows:
+			if (resource := catalog.names.get(resource)) is None:
+				continue
+
+			grids.setdefault(resource, SpatialGrid()).insert(identity, x, y)
+
+		# Inserts that are still in flight keep their reservations
+		for resource, grid in self.grids.items():
+			for cell in grid.cells.values():
+				for identity, (x, y, item) in list(cell.items()):
+					if identity < 0:
+						grids.setdefault(resource, SpatialGrid()).insert(identity, x, y)
+
+		# The query may have started before (or ended up seeing only some of) the changes
+		# made while it ran, replaying them in order brings the new grids up to date
+		for resource, identity, position in journal:
+			if position is None:
+				if (grid := grids.get(resource)):
+					grid.remove(identity)
+			else:
+				grids.setdefault(resource, SpatialGrid()).insert(identity, *position)
+
+		self.grids = grids
+
+	def add(self, resource :str, identity :int, x :float, y :float):
+		self.grids.setdefault(resource, SpatialGrid()).insert(identity, x, y)
+		for journal in self._journals:
+			journal.append((resource, identity, (x, y)))
+
+	def remove(self, resource :str, identity :int):
+		if (grid := self.grids.get(resource)):
+			grid.remove(identity)
+		for journal in self._journals:
+			journal.append((resource, identity, None))
+
+	def reserve(self, resource :str, x :float, y :float):
+		"""
+		Holds (x, y) for a position that's about to be inserted, so that concurrent submissions
+		near it are rejected before the insert has finished. Returns a (negative) reservation id,
+		which has to be passed to remove() once the insert is done or has failed.
+		"""
+		reservation = next(self._reservations)
+		self.add(resource, reservation, x, y)
+		return reservation
+
+	def near(self, resource :str, x :float, y :float, radius :float, exclude :int|None = None):
+		"""
+		Returns the id of an existing position of `resource` within `radius` of (x, y), or None.
+		Reserved positions are returned as their (negative) reservation id.
+		"""
+		if radius <= 0 or (grid := self.grids.get(resource)) is None:
+			return None
+
+		for identity, px, py, item in grid.nearby(x, y, radius):
+			if identity != exclude:
+				return identity
+
+		return None
+
+	def __len__(self):
+		return sum(len(grid) for grid in self.grids.values())
+
+def find_near_duplicates(rows, radius :float):
+	"""
+	Given rows of {'id', 'resource', 'x', 'y'} ordered oldest first, returns the ids
+	of every position that lies within `radius` of an older position of the same resource
+	which is itself being kept. Used to compact data gathered before deduplication existed.
+	"""
+	kept = PositionIndex()
+	duplicates = []
+	for row in rows:
+		if kept.near(row['resource'], row['x'], row['y'], radius) is not None:
+			duplicates.append(row['id'])
+		else:
+			kept.add(row['resource'], row['id'], row['x'], row['y'])
+
+	return duplicates
@@ -0,0 +1,66 @@
+import gzip
+import json
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+# Content-Encodings we can produce, in order of preference
+CODINGS = ('br', 'gzip') if brotli is not None else ('gzip', )
+
+def dumps(data) -> bytes:
+	"""
+	Encodes data as compact JSON bytes, using orjson when it's installed
+	(pip install coreborn[fast]) and the standard library otherwise.
+	Either way the result is equivalent JSON, only the formatting of some floats differs.
+	"""
+	if orjson is not None:
+		return orjson.dumps(data)
+
+	return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('UTF-8')
+
+def compress(body :bytes, coding :str, best :bool = False) -> bytes:
+	"""
+	Compresses at a level that costs a few milliseconds per megabyte, as the server compresses
+	every new data version while requests wait on it. `best` spends several times as long on
+	a slightly smaller result, which is worth it for files that are written once (coreborn export).
+	gzip is written without a timestamp so that the same body always compresses to the same bytes.
+	"""
+	if coding == 'br':
+		return brotli.compress(body, quality=11 if best else 5)
+	elif coding == 'gzip':
+		return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+
+	raise ValueError(f"Unsupported content encoding {coding}")
+
+def negotiate_coding(accept_encoding :str|None):
+	"""
+	Returns the coding out of CODINGS with the highest q-value in Accept-Encoding
+	(CODINGS order only breaks ties), or None for identity when none of them is allowed.
+	"""
+	if not accept_encoding:
+		return None
+
+	allowed = {}
+	for item in accept_encoding.split(','):
+		coding, *parameters = item.split(';')
+		quality = 1.0
+		for parameter in parameters:
+			key, _, value = parameter.strip().partition('=')
+			if key.strip().lower() == 'q':
+				try:
+					quality = min(max(float(value), 0.0), 1.0)
+				except ValueError:
+					quality = 0.0
+		allowed[coding.strip().lower()] = quality
+
+	qualities = {coding : allowed.get(coding, allowed.get('*', 0.0)) for coding in CODINGS}
+	# max() returns the first of equal items, which is the preferred one in CODINGS
+	coding = max(CODINGS, key=qualities.__getitem__)
+	return coding if qualities[coding] > 0 else None
@@ -0,0 +1,100 @@
+"""
+Writes the map as static files, so that reads can be served straight from
+a web server or CDN (see `coreborn export`). For every export the directory holds:
+
+	map.json                     the full map, always the latest export
+	map.<hash>.json              the same, under a content hashed (immutable) name
+	<resource>.json              {category: {resource: ...}} for a single resource
+	<resource>.<hash>.json       the same, content hashed
+	manifest.json                etag, generation time and the hashed names of the above
+
+every .json file also gets precompressed .json.gz (and .json.br with brotli installed)
+variants for gzip_static/brotli_static. Files are written to a temporary name and
+renamed into place, so readers never see a partial file.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from .encoding import CODINGS, compress, dumps
+
+# map.0123456789abcdef.json, heartwood.0123456789abcdef.json.gz etc
+HASHED = re.compile(r'^.+\.[0-9a-f]{16}\.json(\.gz|\.br)?$')
+SAFE_NAME = re.compile(r'^[\w-]+$')
+SUFFIXES = {'gzip' : '.gz', 'br' : '.br'}
+
+def write_atomic(path :str, body :bytes):
+	directory = os.path.dirname(path) or '.'
+	handle, temporary = tempfile.mkstemp(dir=directory, prefix='.export-')
+	try:
+		with os.fdopen(handle, 'wb') as output:
+			output.write(body)
+		os.chmod(temporary, 0o644)
+		os.replace(temporary, path)
+	except:
+		os.unlink(temporary)
+		raise
+
+def write_variants(directory :str, name :str, body :bytes):
+	"""
+	Writes name.<hash>.json and name.json (plus compressed variants of both),
+	returns the file names that were written.
+	"""
+	hashed = f"{name}.{hashlib.sha256(body).hexdigest()[:16]}.json"
+	variants = [('', body)] + [(SUFFIXES[coding], compress(body, coding, best=True)) for coding in CODINGS]
+
+	written = []
+	for suffix, content in variants:
+		# Hashed files never change, so they only need writing once.
+		# Touching them keeps them from being pruned while they're current.
+		if os.path.exists(path := os.path.join(directory, hashed + suffix)):
+			os.utime(path)
+		else:
+			write_atomic(path, content)
+		written.append(hashed + suffix)
+
+	# The stable names are replaced after the hashed ones exist
+	for suffix, content in variants:
+		write_atomic(os.path.join(directory, f"{name}.json{suffix}"), content)
+		written.append(f"{name}.json{suffix}")
+
+	return written
+
+def export(entry, directory :str, grace :float = 3600):
+	"""
+	Writes a MapEntry to `directory`, returns the manifest.
+	Hashed files of earlier exports are removed once they're older than `grace` seconds,
+	which gives clients and caches holding an older manifest time to fetch them.
+	"""
+	os.makedirs(directory, exist_ok=True)
+
+	written = write_variants(directory, 'map', entry.body)
+	resources = {}
+	for category, members in entry.data.items():
+		for resource, info in members.items():
+			if not SAFE_NAME.match(resource) or resource in ('map', 'manifest'):
+				print(f"Not exporting resource {resource!r}, its name can't be used as a file name")
+				continue
+
+			files = write_variants(directory, resource, dumps({category : {resource : info}}))
+			resources[resource] = files[0]
+			written += files
+
+	manifest = {
+		'etag' : entry.etag,
+		'generated' : int(time.time()),
+		'map' : written[0],
+		'resources' : resources
+	}
+	write_atomic(os.path.join(directory, 'manifest.json'), dumps(manifest))
+
+	expired = time.time() - grace
+	written = set(written)
+	for name in os.listdir(directory):
+		path = os.path.join(directory, name)
+		if HASHED.match(name) and name not in written and os.path.getmtime(path) < expired:
+			os.unlink(path)
+
+	return manifest
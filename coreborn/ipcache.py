@@ -0,0 +1,59 @@
+import collections
+import dataclasses
+import time
+
+from .database.statements import Statement
+
+# Resolves an ip hash to its row, registering it if it's new. The no-op update makes a
+# conflicting insert return the existing row, even one committed after this statement began
+# (which a separate SELECT in the same statement wouldn't see).
+LOOKUP_IP = Statement('lookup_ip', """
+	INSERT INTO ip_addresses (ip, blocked) VALUES(%s, false)
+	ON CONFLICT (ip) DO UPDATE SET ip=EXCLUDED.ip
+	RETURNING id, blocked""", mode='one')
+
+@dataclasses.dataclass
+class IPCache:
+	"""
+	Bounded LRU cache of ip hash -> (id, blocked) row with a TTL per entry.
+	A miss resolves (and registers if needed) the ip hash in a single query.
+	Changes to the blocked flag invalidate entries through the ip_addresses
+	trigger and LISTEN/NOTIFY, the TTL is only a fallback for missed notifications.
+	"""
+	max_size :int = 10000
+	ttl :float = 30
+	hits :int = 0
+	misses :int = 0
+	entries :collections.OrderedDict = dataclasses.field(default_factory=collections.OrderedDict)
+
+	async def lookup(self, db, ip_hash :str):
+		now = time.monotonic()
+		if (entry := self.entries.get(ip_hash)) and entry[1] > now:
+			self.entries.move_to_end(ip_hash)
+			self.hits += 1
+			return entry[0]
+
+		self.misses += 1
+		ip_info = await db.execute(LOOKUP_IP, (ip_hash, ))
+
+		if ip_info:
+			self.entries[ip_hash] = (ip_info, now + self.ttl)
+			self.entries.move_to_end(ip_hash)
+			while len(self.entries) > self.max_size:
+				self.entries.popitem(last=False)
+
+		return ip_info
+
+	def invalidate(self, ip_hash :str|None = None):
+		if ip_hash is None:
+			self.entries.clear()
+		else:
+			self.entries.pop(ip_hash, None)
+
+	@property
+	def stats(self):
+		return {
+			'size' : len(self.entries),
+			'hits' : self.hits,
+			'misses' : self.misses
+		}
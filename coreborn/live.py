@@ -0,0 +1,139 @@
+import asyncio
+import dataclasses
+import json
+import select
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+from typing import Callable
+
+from .database.postgresql import Database, CHANNEL
+
+# Notifications that are passed on to subscribers, the rest
+# (catalog and ip changes) are only of interest to the workers.
+PUBLIC_OPS = {'add', 'remove', 'resync'}
+
+@dataclasses.dataclass(eq=False)
+class Subscriber:
+	queue :asyncio.Queue
+	dropped :bool = False
+
+	async def events(self, keepalive :float):
+		"""
+		Yields Server-Sent Events until the subscriber is dropped,
+		sending a comment line every `keepalive` seconds to keep idle connections open.
+		"""
+		while not self.dropped:
+			try:
+				payload = await asyncio.wait_for(self.queue.get(), timeout=keepalive)
+			except asyncio.TimeoutError:
+				yield ': keepalive\n\n'
+				continue
+
+			if self.dropped:
+				break
+
+			yield f"event: {payload.get('op', 'message')}\ndata: {json.dumps(payload)}\n\n"
+
+@dataclasses.dataclass
+class Broadcaster:
+	"""
+	Listens for position changes on a dedicated Postgres connection and fans
+	them out to every subscriber in this worker. As all workers LISTEN on
+	the same channel, a write on one worker reaches the subscribers of all of them.
+
+	Each subscriber has a bounded queue, subscribers that can't keep up are dropped
+	rather than letting their backlog grow.
+	"""
+	database :Database
+	queue_size :int = 64
+	max_subscribers :int = 5000
+	on_change :Callable[[dict], None]|None = None
+	subscribers :set = dataclasses.field(default_factory=set)
+	dropped :int = 0
+	_loop :asyncio.AbstractEventLoop|None = None
+	_thread :threading.Thread|None = None
+	_running :bool = False
+
+	def start(self, loop :asyncio.AbstractEventLoop):
+		self._loop = loop
+		self._running = True
+		self._thread = threading.Thread(target=self._listen, name='coreborn-listen', daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._running = False
+		for subscriber in list(self.subscribers):
+			self.unsubscribe(subscriber)
+
+	def subscribe(self):
+		if len(self.subscribers) >= self.max_subscribers:
+			return None
+
+		subscriber = Subscriber(queue=asyncio.Queue(maxsize=self.queue_size))
+		self.subscribers.add(subscriber)
+		return subscriber
+
+	def unsubscribe(self, subscriber :Subscriber):
+		subscriber.dropped = True
+		self.subscribers.discard(subscriber)
+
+	def publish(self, payload :dict):
+		# A payload is passed on as a single event, even when it holds a list of positions,
+		# so a bulk insert only takes up a few places in each subscriber's queue.
+		if self.on_change:
+			self.on_change(payload)
+
+		if payload.get('op') not in PUBLIC_OPS:
+			return
+
+		for subscriber in list(self.subscribers):
+			try:
+				subscriber.queue.put_nowait(payload)
+			except asyncio.QueueFull:
+				self.dropped += 1
+				self.unsubscribe(subscriber)
+
+	def _listen(self):
+		connection = None
+		while self._running:
+			try:
+				if connection is None or connection.closed:
+					connection = self.database.dedicated_connection()
+					with connection.cursor() as cur:
+						cur.execute(f"LISTEN {CHANNEL}")
+					# Changes made while we weren't listening are unknown to us,
+					# so treat a (re)connect as a change in itself.
+					self._loop.call_soon_threadsafe(self.publish, {'op' : 'resync'})
+
+				if select.select([connection], [], [], 5) == ([], [], []):
+					continue
+
+				connection.poll()
+				while connection.notifies:
+					notify = connection.notifies.pop(0)
+					try:
+						payload = json.loads(notify.payload)
+					except ValueError:
+						continue
+
+					self._loop.call_soon_threadsafe(self.publish, payload)
+			except (psycopg2.Error, OSError, ValueError) as error:
+				print(f"Lost connection to the LISTEN channel: {error}")
+				try:
+					connection.close()
+				except:
+					pass
+				connection = None
+				time.sleep(1)
+
+		if connection is not None:
+			connection.close()
+
+	@property
+	def stats(self):
+		return {
+			'subscribers' : len(self.subscribers),
+			'dropped' : self.dropped
+		}
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, root_validator, validator
+from typing import Literal
 
 class Position(BaseModel):
 	x :float
@@ -17,11 +18,18 @@ class Position(BaseModel):
 		raise ValueError(f"Position() is off the charts")
 
 
+class BulkPosition(Position):
+	resource :str
+
+
 class DBConfig(BaseModel):
 	password :str|None = None
 	hostname :str = '127.0.01'
 	username :str = 'coreborn'
 	database :str = 'coreborn'
+	pool_min :int = 1
+	pool_max :int = 10
+	backend :Literal['sync', 'async'] = 'sync'
 
 
 class Colors(BaseModel):
@@ -37,6 +45,103 @@ class Colors(BaseModel):
 	coal :str = "#151716"
 
 
+class LiveConfig(BaseModel):
+	enabled :bool = True
+	max_subscribers :int = 5000
+	queue_size :int = 64
+	keepalive :float = 15
+
+
+class ClusterConfig(BaseModel):
+	# Zoom level z splits the map into 2**z cells per axis
+	max_zoom :int = 8
+
+
+class BulkConfig(BaseModel):
+	# At most [ratelimit.bulk] burst, see Configuration.validate_bulk()
+	max_items :int = 500
+
+
+class IPCacheConfig(BaseModel):
+	max_size :int = 10000
+	# Seconds, only a fallback as block changes are NOTIFY'd
+	ttl :float = 30
+
+
+class BucketConfig(BaseModel):
+	# Tokens per second, and the most tokens a bucket holds
+	rate :float
+	burst :float
+
+
+class RateLimitConfig(BaseModel):
+	enabled :bool = True
+	max_keys :int = 10000
+	# Rejected requests within block_window seconds before an ip is blocked, 0 disables
+	block_after :int = 0
+	block_window :float = 60
+	put :BucketConfig = BucketConfig(rate=0.5, burst=10)
+	bulk :BucketConfig = BucketConfig(rate=2, burst=500)
+	delete :BucketConfig = BucketConfig(rate=0.2, burst=5)
+
+
+class VotingConfig(BaseModel):
+	# Removal votes (from distinct ips) needed before a position is deleted
+	threshold :int = 4
+
+
+class WriteBehindConfig(BaseModel):
+	enabled :bool = False
+	batch_size :int = 200
+	flush_interval_ms :float = 50
+	max_queue :int = 10000
+
+
+class DedupeConfig(BaseModel):
+	# New positions within this distance (in normalized map units) of an
+	# existing position of the same resource are rejected, 0 disables
+	radius :float = 0.002
+
+
+class CacheConfig(BaseModel):
+	# Serve reads from the in-memory map snapshot, when disabled every read
+	# is streamed from the database instead (less memory, more queries)
+	enabled :bool = True
+	# Reads streamed at once when disabled, each holds a database connection so this
+	# has to stay below [db] pool_max. Clients that stall for stream_timeout seconds are cut off.
+	max_streams :int = 4
+	stream_timeout :float = 10
+
+
+class SyncConfig(BaseModel):
+	# Days of position changes kept for /api/sync, clients that haven't synced
+	# for longer get a full resync. Pruned every prune_interval seconds.
+	retention_days :float = 30
+	prune_interval :float = 3600
+
+
 class Configuration(BaseModel):
 	db :DBConfig
 	colors :Colors
+	live :LiveConfig = LiveConfig()
+	clusters :ClusterConfig = ClusterConfig()
+	bulk :BulkConfig = BulkConfig()
+	ipcache :IPCacheConfig = IPCacheConfig()
+	ratelimit :RateLimitConfig = RateLimitConfig()
+	voting :VotingConfig = VotingConfig()
+	writebehind :WriteBehindConfig = WriteBehindConfig()
+	dedupe :DedupeConfig = DedupeConfig()
+	cache :CacheConfig = CacheConfig()
+	sync :SyncConfig = SyncConfig()
+
+	@root_validator(skip_on_failure=True)
+	def validate_streams(cls, values):
+		if not values['cache'].enabled and values['cache'].max_streams >= values['db'].pool_max:
+			raise ValueError(f"[cache] max_streams has to be lower than [db] pool_max, or streamed reads can take every connection")
+		return values
+
+	@root_validator(skip_on_failure=True)
+	def validate_bulk(cls, values):
+		if values['ratelimit'].enabled and values['bulk'].max_items > values['ratelimit'].bulk.burst:
+			raise ValueError(f"[bulk] max_items can't be more than [ratelimit.bulk] burst, or the largest submissions can never pass the rate limit")
+		return values
@@ -0,0 +1,68 @@
+import collections
+import dataclasses
+import math
+import time
+
+@dataclasses.dataclass
+class RateLimiter:
+	"""
+	Token bucket per key (the ip hash), refilled at `rate` tokens per second up to `burst`.
+	Buckets are kept in a LRU of at most `max_keys` entries so memory stays constant,
+	no matter how many distinct keys are seen. A key that's been evicted simply
+	starts over with a full bucket, same as any new key would.
+
+	Rejections are counted per key within `block_window` seconds, once a key reaches
+	`block_after` of them (and block_after is non-zero) check() reports it for blocking.
+	"""
+	rate :float
+	burst :float
+	max_keys :int = 10000
+	block_after :int = 0
+	block_window :float = 60
+	allowed :int = 0
+	rejected :int = 0
+	buckets :collections.OrderedDict = dataclasses.field(default_factory=collections.OrderedDict)
+
+	def check(self, key :str, cost :float = 1):
+		"""
+		Returns (allowed, retry_after, block) where retry_after is the number of
+		seconds until the request would be allowed, and block is True exactly once
+		when the key crosses the block_after threshold.
+		A cost above `burst` could never be paid, so it's rejected (with retry_after None)
+		without touching the bucket or counting toward block_after.
+		"""
+		if cost > self.burst:
+			self.rejected += 1
+			return False, None, False
+
+		now = time.monotonic()
+		if (bucket := self.buckets.get(key)) is None:
+			# tokens, last refill, rejections, start of the rejection window
+			bucket = self.buckets[key] = [self.burst, now, 0, now]
+			while len(self.buckets) > self.max_keys:
+				self.buckets.popitem(last=False)
+		else:
+			bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+			bucket[1] = now
+			self.buckets.move_to_end(key)
+
+		if bucket[0] >= cost:
+			bucket[0] -= cost
+			self.allowed += 1
+			return True, 0, False
+
+		self.rejected += 1
+		if now - bucket[3] > self.block_window:
+			bucket[2], bucket[3] = 0, now
+		bucket[2] += 1
+
+		retry_after = math.ceil((cost - bucket[0]) / self.rate) if self.rate > 0 else None
+		return False, retry_after, self.block_after > 0 and bucket[2] == self.block_after
+
+	@property
+	def stats(self):
+		return {
+			'keys' : len(self.buckets),
+			'allowed' : self.allowed,
+			'rejected' : self.rejected
+		}
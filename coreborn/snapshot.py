@@ -0,0 +1,186 @@
+import asyncio
+import dataclasses
+import hashlib
+from typing import Any, Awaitable, Callable
+
+from .encoding import compress, dumps
+from .spatial import SpatialGrid, cluster_pyramid
+from .wire import encode
+
+@dataclasses.dataclass(frozen=True)
+class MapEntry:
+	version :int
+	data :Any
+	body :bytes
+	etag :str
+	index :dict
+	_clusters :dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
+	_encoded :dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
+	_compressing :dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
+
+	@classmethod
+	def build(cls, version, data):
+		# Encoded once per version, every request for the full map is then served these bytes as is.
+		body = dumps(data)
+
+		# The ETag is derived from the content rather than the version,
+		# as versions are per process and restart from 0 with every worker.
+		# The builder emits categories, resources and positions in a fixed order, so equal maps give equal bytes.
+		digest = hashlib.sha256(body).hexdigest()
+
+		index = {}
+		for category, resources in data.items():
+			for resource, info in resources.items():
+				index[resource] = grid = SpatialGrid()
+				for position in info['positions']:
+					grid.insert(position['id'], position['x'], position['y'], position)
+
+		return cls(version=version, data=data, body=body, etag=f'"{digest[:32]}"', index=index)
+
+	def subset(self, category :str|None = None, resource :str = '*'):
+		"""
+		Returns the same structure as .data, but only with the given category and/or resource.
+		"""
+		if category is None and resource == '*':
+			return self.data
+
+		result = {}
+		for name, resources in self.data.items():
+			if category is not None and name != category:
+				continue
+
+			for member, info in resources.items():
+				if resource == '*' or member == resource:
+					result.setdefault(name, {})[member] = info
+
+		return result
+
+	def viewport(self, x0 :float, y0 :float, x1 :float, y1 :float, resource :str = '*', category :str|None = None):
+		"""
+		Returns the same structure as .data, but only with the positions inside the bounding box.
+		"""
+		result = {}
+		for name, resources in self.subset(category, resource).items():
+			for member, info in resources.items():
+				result.setdefault(name, {})[member] = {
+					**info,
+					'positions' : sorted(
+						(item for identity, x, y, item in self.index[member].within(x0, y0, x1, y1)),
+						key=lambda position: position['id']
+					)
+				}
+
+		return result
+
+	def clusters(self, zoom :int, max_zoom :int, viewport :tuple|None = None):
+		"""
+		Returns the clusters for every resource at the given zoom level,
+		optionally limited to clusters whose centroid lies within the viewport.
+		The pyramid of all zoom levels is built once per entry (and thus per data version).
+		"""
+		if not self._clusters:
+			for category, resources in self.data.items():
+				for name, info in resources.items():
+					self._clusters[(category, name)] = cluster_pyramid(
+						((position['x'], position['y']) for position in info['positions']),
+						max_zoom=max_zoom
+					)
+
+		zoom = min(max(zoom, 0), max_zoom)
+		result = {}
+		for (category, name), pyramid in self._clusters.items():
+			clusters = pyramid[zoom]
+			if viewport:
+				x0, y0, x1, y1 = viewport
+				clusters = [cluster for cluster in clusters if x0 <= cluster['x'] <= x1 and y0 <= cluster['y'] <= y1]
+
+			result.setdefault(category, {})[name] = clusters
+
+		return result
+
+	async def encoded(self, format :str = 'json', coding :str|None = None, category :str|None = None, resource :str = '*'):
+		"""
+		Returns the map (or a subset() of it) in one of the coreborn.wire formats, optionally compressed
+		with a coding from coreborn.encoding.CODINGS. Each variant is only encoded once per entry.
+		"""
+		key = (format, coding, category, resource)
+		if (body := self._encoded.get(key)) is not None:
+			return body
+
+		if coding is None:
+			body = self.body if format == 'json' and category is None and resource == '*' else encode(self.subset(category, resource), format)
+		else:
+			# Compressed in a worker thread to keep the event loop free,
+			# requests arriving meanwhile for the same variant wait for the same result.
+			if (compressing := self._compressing.get(key)) is None:
+				uncompressed = await self.encoded(format, None, category, resource)
+				compressing = self._compressing[key] = asyncio.ensure_future(asyncio.to_thread(compress, uncompressed, coding))
+				compressing.add_done_callback(lambda future: self._compressing.pop(key, None))
+			body = await asyncio.shield(compressing)
+
+		self._encoded[key] = body
+		return body
+
+	def etag_for(self, format :str = 'json', coding :str|None = None):
+		# Every representation (and compressed variant of it) needs its own validator
+		suffix = '-'.join(part for part in (format if format != 'json' else None, coding) if part)
+		if not suffix:
+			return self.etag
+
+		return f'{self.etag[:-1]}-{suffix}"'
+
+	def matches(self, if_none_match :str|None, etag :str|None = None):
+		if not if_none_match:
+			return False
+
+		etag = etag or self.etag
+		for tag in if_none_match.split(','):
+			tag = tag.strip()
+			if tag == '*' or tag.removeprefix('W/') == etag:
+				return True
+
+		return False
+
+@dataclasses.dataclass
+class MapSnapshot:
+	"""
+	Keeps the last built map in memory together with the data version it was built from.
+	Writers call bump() after changing the data, readers call get() which only
+	rebuilds (using the builder) if the version moved since the last build.
+	"""
+	builder :Callable[[], Awaitable[Any]]
+	version :int = 0
+	hits :int = 0
+	misses :int = 0
+	rebuilds :int = 0
+	_entry :MapEntry|None = None
+	_build_lock :asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock)
+
+	def bump(self):
+		self.version += 1
+		return self.version
+
+	async def get(self):
+		if (entry := self._entry) and entry.version == self.version:
+			self.hits += 1
+			return entry
+
+		async with self._build_lock:
+			self.misses += 1
+			# Another request might have rebuilt while we waited for the lock
+			if not self._entry or self._entry.version != self.version:
+				version = self.version
+				self._entry = MapEntry.build(version, await self.builder())
+				self.rebuilds += 1
+
+			return self._entry
+
+	@property
+	def stats(self):
+		return {
+			'version' : self.version,
+			'built_version' : self._entry.version if self._entry else None,
+			'hits' : self.hits,
+			'misses' : self.misses,
+			'rebuilds' : self.rebuilds
+		}
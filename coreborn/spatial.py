@@ -0,0 +1,110 @@
+import dataclasses
+import math
+from typing import Any, Iterator
+
+@dataclasses.dataclass
+class SpatialGrid:
+	"""
+	Uniform grid over the normalized map (0,0 top left to 1,1 bottom right).
+	Points are bucketed per cell, which makes both viewport lookups and
+	"anything within radius" checks only touch the few cells that can match.
+	"""
+	cells_per_axis :int = 64
+	cells :dict = dataclasses.field(default_factory=dict)
+	locations :dict = dataclasses.field(default_factory=dict)
+
+	def cell(self, x :float, y :float):
+		n = self.cells_per_axis
+		return (min(max(int(x * n), 0), n - 1), min(max(int(y * n), 0), n - 1))
+
+	def insert(self, identity, x :float, y :float, item :Any = None):
+		if identity in self.locations:
+			self.remove(identity)
+
+		cell = self.cell(x, y)
+		self.cells.setdefault(cell, {})[identity] = (x, y, item)
+		self.locations[identity] = cell
+
+	def remove(self, identity):
+		if (cell := self.locations.pop(identity, None)) is None:
+			return False
+
+		bucket = self.cells[cell]
+		del bucket[identity]
+		if not bucket:
+			del self.cells[cell]
+
+		return True
+
+	def _cells_between(self, x0 :float, y0 :float, x1 :float, y1 :float):
+		cx0, cy0 = self.cell(x0, y0)
+		cx1, cy1 = self.cell(x1, y1)
+		for cx in range(cx0, cx1 + 1):
+			for cy in range(cy0, cy1 + 1):
+				if (bucket := self.cells.get((cx, cy))):
+					yield bucket
+
+	def within(self, x0 :float, y0 :float, x1 :float, y1 :float) -> Iterator[tuple]:
+		"""
+		Yields (identity, x, y, item) for every point inside the bounding box (inclusive).
+		"""
+		for bucket in self._cells_between(x0, y0, x1, y1):
+			for identity, (x, y, item) in bucket.items():
+				if x0 <= x <= x1 and y0 <= y <= y1:
+					yield identity, x, y, item
+
+	def nearby(self, x :float, y :float, radius :float) -> Iterator[tuple]:
+		"""
+		Yields (identity, x, y, item) for every point within `radius` of (x, y).
+		"""
+		for identity, px, py, item in self.within(x - radius, y - radius, x + radius, y + radius):
+			if math.hypot(px - x, py - y) <= radius:
+				yield identity, px, py, item
+
+	def __len__(self):
+		return len(self.locations)
+
+	def __contains__(self, identity):
+		return identity in self.locations
+
+def cluster_pyramid(points, max_zoom :int = 8):
+	"""
+	Grid clustering of (x, y) points for every zoom level from 0 up to max_zoom,
+	where zoom level z splits the map into 2**z cells per axis.
+	The finest level is bucketed from the points and every coarser level
+	is merged from the one below it, so the whole pyramid costs a single pass.
+
+	Returns a list indexed by zoom level, of lists with {'x', 'y', 'count'} clusters
+	positioned at the centroid of their points.
+	"""
+	n = 2 ** max_zoom
+	level = {}
+	for x, y in points:
+		cell = (min(max(int(x * n), 0), n - 1), min(max(int(y * n), 0), n - 1))
+		if (bucket := level.get(cell)) is None:
+			level[cell] = [x, y, 1]
+		else:
+			bucket[0] += x
+			bucket[1] += y
+			bucket[2] += 1
+
+	levels = [level]
+	for zoom in range(max_zoom, 0, -1):
+		parent = {}
+		for (cx, cy), (sx, sy, count) in level.items():
+			if (bucket := parent.get((cx // 2, cy // 2))) is None:
+				parent[(cx // 2, cy // 2)] = [sx, sy, count]
+			else:
+				bucket[0] += sx
+				bucket[1] += sy
+				bucket[2] += count
+
+		levels.append(parent)
+		level = parent
+
+	return [
+		[
+			{'x' : sx / count, 'y' : sy / count, 'count' : count}
+			for sx, sy, count in level.values()
+		] for level in reversed(levels)
+	]
@@ -0,0 +1,113 @@
+import asyncio
+import contextlib
+
+from .database.statements import Statement
+from .encoding import dumps
+
+STREAM_POSITIONS = Statement('stream_positions', """
+	SELECT positions.resource, positions.id, positions.x, positions.y
+	FROM positions
+	LEFT JOIN ip_addresses ON positions.ip=ip_addresses.id
+	WHERE ip_addresses.blocked IS NOT TRUE
+	AND positions.resource = ANY(%s::bigint[])
+	AND positions.x BETWEEN %s AND %s AND positions.y BETWEEN %s AND %s
+	ORDER BY array_position(%s::bigint[], positions.resource), positions.id""")
+
+async def stream_map(db, catalog, colors, category=None, resource='*', viewport=None):
+	"""
+	Yields the same JSON as build_map() (limited to a category, resource and/or viewport) in chunks,
+	while reading the positions through a server side cursor. Neither the rows nor the
+	encoded body are ever held in memory as a whole.
+	"""
+	selection = [
+		(name, member)
+		for name, members in catalog.resources.items() if category in (None, name)
+		for member in members if resource in ('*', member)
+	]
+	ids = [catalog.id_of(member) for name, member in selection]
+	x0, y0, x1, y1 = viewport or (0.0, 0.0, 1.0, 1.0)
+
+	batches = db.stream(STREAM_POSITIONS, (ids, x0, x1, y0, y1, ids))
+	buffered = iter(())
+
+	async def next_row():
+		nonlocal buffered
+		while (row := next(buffered, None)) is None:
+			if (rows := await anext(batches, None)) is None:
+				return None
+			buffered = iter(rows)
+		return row
+
+	try:
+		row = await next_row()
+		previous = None
+		yield b'{'
+		for index, (name, member) in enumerate(selection):
+			if name != previous:
+				yield (b'},' if previous is not None else b'') + dumps(name) + b':{'
+				previous = name
+			else:
+				yield b','
+
+			# The resource header as build_map() has it, with the positions list left open
+			yield dumps(member) + b':' + dumps({
+				'icon' : None,
+				'color' : getattr(colors, member, '#F444FF'),
+				'visible' : True
+			})[:-1] + b',"positions":['
+
+			chunk, separator = [], b''
+			while row is not None and row.resource == ids[index]:
+				chunk.append(separator + dumps({'id' : row.id, 'x' : row.x, 'y' : row.y}))
+				separator = b','
+				if len(chunk) >= 1000:
+					yield b''.join(chunk)
+					chunk = []
+				row = await next_row()
+
+			yield b''.join(chunk) + b']}'
+
+		yield b'}}' if previous is not None else b'}'
+	finally:
+		await batches.aclose()
+
+async def relay(chunks, slots :asyncio.Semaphore, timeout :float, buffer :int = 16):
+	"""
+	Passes on `chunks` (read from the database) through a small buffer, while holding one of `slots`
+	for as long as the database side is being read. A client that doesn't keep up, leaving the buffer
+	full for `timeout` seconds, gets its response cut short, so that no client can hold on to a pooled
+	connection (and transaction) for longer than that.
+	"""
+	queue = asyncio.Queue(maxsize=buffer)
+
+	async def produce():
+		async with slots:
+			try:
+				async for chunk in chunks:
+					await asyncio.wait_for(queue.put(chunk), timeout)
+			except asyncio.TimeoutError:
+				print(f"Stopped streaming to a client that didn't keep up for {timeout}s")
+			finally:
+				await chunks.aclose()
+
+	producer = asyncio.create_task(produce())
+	try:
+		while True:
+			getter = asyncio.ensure_future(queue.get())
+			await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+			if getter.done():
+				yield getter.result()
+				continue
+
+			getter.cancel()
+			while not queue.empty():
+				yield queue.get_nowait()
+
+			# Raises whatever went wrong on the database side
+			producer.result()
+			return
+	finally:
+		producer.cancel()
+		# Anything it raised has already been passed on above
+		with contextlib.suppress(asyncio.CancelledError, Exception):
+			await producer
@@ -0,0 +1,124 @@
+"""
+Compact representations of the map (the same structure that MapSnapshot builds),
+for clients that don't need one JSON object per position.
+
+columnar (application/vnd.coreborn.columnar+json):
+	{"scale": 65535, "categories": {category: {resource: {"icon", "color", "visible", "ids": [...], "x": [...], "y": [...]}}}}
+	x and y are quantized to integers 0..scale, divide by scale to get the normalized coordinate back.
+
+binary (application/vnd.coreborn.map):
+	b"CBMAP1\\0\\0", <uint16 resource count>, then per resource
+	<uint8 category length> <category> <uint8 name length> <name> <uint32 position count>
+	<uint64 id>... <uint16 x>... <uint16 y>...
+	all little-endian, with x and y quantized the same way as columnar.
+"""
+import struct
+import sys
+from array import array
+
+from .encoding import dumps
+
+SCALE = 65535
+BINARY_MAGIC = b'CBMAP1\0\0'
+
+# format name -> media type
+FORMATS = {
+	'json' : 'application/json',
+	'columnar' : 'application/vnd.coreborn.columnar+json',
+	'binary' : 'application/vnd.coreborn.map',
+}
+
+def quantize(value :float):
+	return min(max(round(value * SCALE), 0), SCALE)
+
+def negotiate(requested :str|None, accept :str|None):
+	"""
+	Picks the format from ?format= if given, otherwise from the Accept header:
+	the media type with the highest q-value wins (the earliest one on a tie), q=0 rules a format out
+	and */* or application/* stand for the first format that isn't ruled out.
+	Returns None for an unknown ?format=, and falls back to json for anything else.
+	"""
+	if requested is not None:
+		return requested if requested in FORMATS else None
+
+	if not accept:
+		return 'json'
+
+	qualities, wildcard = {}, 0.0
+	for media_range in accept.split(','):
+		media_type, *parameters = media_range.split(';')
+		media_type = media_type.strip().lower()
+
+		quality = 1.0
+		for parameter in parameters:
+			key, _, value = parameter.strip().partition('=')
+			if key.strip().lower() == 'q':
+				try:
+					quality = min(max(float(value), 0.0), 1.0)
+				except ValueError:
+					quality = 0.0
+
+		if media_type in ('*/*', 'application/*'):
+			wildcard = max(wildcard, quality)
+			continue
+
+		for name, candidate in FORMATS.items():
+			if media_type == candidate and name not in qualities:
+				qualities[name] = quality
+
+	# Dicts keep insertion order and max() returns the first of equal items, so ties go to the earliest
+	best = max(qualities, key=qualities.get, default=None)
+	if best is not None and qualities[best] > 0 and qualities[best] >= wildcard:
+		return best
+
+	if wildcard > 0:
+		return next((name for name in FORMATS if name not in qualities), 'json')
+
+	return 'json'
+
+def columnar(data :dict):
+	result = {}
+	for category, resources in data.items():
+		for name, info in resources.items():
+			positions = info['positions']
+			result.setdefault(category, {})[name] = {
+				'icon' : info['icon'],
+				'color' : info['color'],
+				'visible' : info['visible'],
+				'ids' : [position['id'] for position in positions],
+				'x' : [quantize(position['x']) for position in positions],
+				'y' : [quantize(position['y']) for position in positions]
+			}
+
+	return {'scale' : SCALE, 'categories' : result}
+
+def binary(data :dict):
+	chunks = [BINARY_MAGIC, struct.pack('<H', sum(len(resources) for resources in data.values()))]
+	for category, resources in data.items():
+		for name, info in resources.items():
+			positions = info['positions']
+			ids = array('Q', (position['id'] for position in positions))
+			xs = array('H', (quantize(position['x']) for position in positions))
+			ys = array('H', (quantize(position['y']) for position in positions))
+			if sys.byteorder != 'little':
+				ids.byteswap()
+				xs.byteswap()
+				ys.byteswap()
+
+			category_bytes, name_bytes = category.encode('UTF-8'), name.encode('UTF-8')
+			chunks += [
+				struct.pack('<B', len(category_bytes)), category_bytes,
+				struct.pack('<B', len(name_bytes)), name_bytes,
+				struct.pack('<I', len(positions)),
+				ids.tobytes(), xs.tobytes(), ys.tobytes()
+			]
+
+	return b''.join(chunks)
+
+def encode(data :dict, format :str):
+	if format == 'columnar':
+		return dumps(columnar(data))
+	elif format == 'binary':
+		return binary(data)
+
+	return dumps(data)
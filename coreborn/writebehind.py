@@ -0,0 +1,133 @@
+import asyncio
+import dataclasses
+import time
+from typing import Any, Awaitable, Callable
+
+@dataclasses.dataclass
+class WriteBehind:
+	"""
+	Buffers submitted items in a bounded queue and hands them to `flush` in batches,
+	either once `batch_size` items are waiting or `interval` seconds after the first one.
+	`flush` receives a list of items and returns one result per item (in order).
+
+	submit() never waits: it returns a future for the item's result,
+	or None when the queue is full so the caller can push back on the client.
+	Callers that won't wait for the result pass detached=True, a failed flush is then only logged.
+	"""
+	flush :Callable[[list], Awaitable[list]]
+	batch_size :int = 200
+	interval :float = 0.05
+	max_queue :int = 10000
+	flushed :int = 0
+	batches :int = 0
+	failures :int = 0
+	last_batch_size :int = 0
+	max_batch_size :int = 0
+	last_flush_latency :float = 0
+	max_flush_latency :float = 0
+	total_flush_latency :float = 0
+	_queue :asyncio.Queue|None = None
+	_task :asyncio.Task|None = None
+	_current :asyncio.Future|None = None
+
+	def start(self):
+		self._queue = asyncio.Queue(maxsize=self.max_queue)
+		self._task = asyncio.create_task(self._run())
+
+	async def stop(self):
+		if self._task:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+
+		if self._current:
+			await self._current
+
+		# Don't lose whatever was still waiting
+		while self._queue and not self._queue.empty():
+			await self._flush(self._take(self.batch_size))
+
+	def submit(self, item :Any, detached :bool = False):
+		if self._queue is None:
+			raise ValueError(f"WriteBehind has to be started before submitting to it")
+
+		future = asyncio.get_running_loop().create_future()
+		try:
+			self._queue.put_nowait((item, future))
+		except asyncio.QueueFull:
+			return None
+
+		if detached:
+			# Marks the exception as retrieved, _flush() already logs the failure once per batch
+			future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+		return future
+
+	def _take(self, limit :int):
+		batch :list = []
+		while self._queue is not None and len(batch) < limit and not self._queue.empty():
+			batch.append(self._queue.get_nowait())
+		return batch
+
+	async def _run(self):
+		while True:
+			batch = [await self._queue.get()]
+			deadline = time.monotonic() + self.interval
+
+			try:
+				while len(batch) < self.batch_size and (remaining := deadline - time.monotonic()) > 0:
+					try:
+						batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+					except asyncio.TimeoutError:
+						break
+			finally:
+				# Even when stopped half way through collecting, the batch is flushed
+				self._current = asyncio.ensure_future(self._flush(batch))
+
+			# Shielded so that stop() can't cancel a flush that's in progress
+			await asyncio.shield(self._current)
+
+	async def _flush(self, batch :list):
+		if not batch:
+			return
+
+		started = time.monotonic()
+		try:
+			results = await self.flush([item for item, future in batch])
+		except Exception as error:
+			print(f"Write-behind flush of {len(batch)} items failed, none of them were written: {error!r}")
+			self.failures += 1
+			for item, future in batch:
+				if not future.done():
+					future.set_exception(error)
+			return
+
+		for (item, future), result in zip(batch, results):
+			if not future.done():
+				future.set_result(result)
+
+		latency = time.monotonic() - started
+		self.batches += 1
+		self.flushed += len(batch)
+		self.last_batch_size = len(batch)
+		self.max_batch_size = max(self.max_batch_size, len(batch))
+		self.last_flush_latency = latency
+		self.max_flush_latency = max(self.max_flush_latency, latency)
+		self.total_flush_latency += latency
+
+	@property
+	def stats(self):
+		return {
+			'queue_depth' : self._queue.qsize() if self._queue else 0,
+			'flushed' : self.flushed,
+			'batches' : self.batches,
+			'failures' : self.failures,
+			'last_batch_size' : self.last_batch_size,
+			'max_batch_size' : self.max_batch_size,
+			'avg_batch_size' : self.flushed / self.batches if self.batches else 0,
+			'last_flush_latency_ms' : self.last_flush_latency * 1000,
+			'max_flush_latency_ms' : self.max_flush_latency * 1000,
+			'avg_flush_latency_ms' : self.total_flush_latency * 1000 / self.batches if self.batches else 0
+		}
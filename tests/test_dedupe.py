@@ -0,0 +1,80 @@
+import asyncio
+import collections
+import types
+
+from coreborn.dedupe import PositionIndex, find_near_duplicates
+
+Row = collections.namedtuple('Row', 'id resource x y')
+
+CATALOG = types.SimpleNamespace(names={1 : 'gold', 2 : 'iron'})
+
+class Database:
+	"""
+	Returns `rows` from the load query once `release` is set, so changes can be made while it runs.
+	"""
+	def __init__(self, rows):
+		self.rows = rows
+		self.started = asyncio.Event()
+		self.release = asyncio.Event()
+
+	async def execute(self, statement, values=()):
+		self.started.set()
+		await self.release.wait()
+		return self.rows
+
+def test_reservations_are_found_until_removed():
+	index = PositionIndex()
+	first = index.reserve('gold', 0.5, 0.5)
+	second = index.reserve('gold', 0.9, 0.9)
+
+	assert first < 0 and second < 0 and first != second
+	assert index.near('gold', 0.501, 0.5, 0.01) == first
+	# A submission doesn't collide with its own reservation
+	assert index.near('gold', 0.501, 0.5, 0.01, exclude=first) is None
+	assert index.near('iron', 0.5, 0.5, 0.01) is None
+	assert index.near('gold', 0.5, 0.5, 0) is None
+
+	index.remove('gold', first)
+	assert index.near('gold', 0.501, 0.5, 0.01) is None
+	assert len(index) == 1
+
+def test_find_near_duplicates_keeps_the_oldest():
+	rows = [
+		{'id' : 1, 'resource' : 'gold', 'x' : 0.5, 'y' : 0.5},
+		{'id' : 2, 'resource' : 'gold', 'x' : 0.501, 'y' : 0.5},
+		{'id' : 3, 'resource' : 'iron', 'x' : 0.5, 'y' : 0.5},
+		{'id' : 4, 'resource' : 'gold', 'x' : 0.6, 'y' : 0.5},
+		# Near 2, but 2 itself is a duplicate and isn't kept
+		{'id' : 5, 'resource' : 'gold', 'x' : 0.508, 'y' : 0.5},
+	]
+	assert find_near_duplicates(rows, 0.005) == [2]
+	assert find_near_duplicates(rows, 0) == []
+
+def test_load_keeps_changes_made_while_it_runs():
+	async def run():
+		index = PositionIndex()
+		index.add('gold', 1, 0.1, 0.1)
+		index.add('gold', 2, 0.2, 0.2)
+		reserved = index.reserve('iron', 0.3, 0.3)
+
+		# The load query sees 1 and 2, but none of the changes below
+		db = Database([Row(1, 1, 0.1, 0.1), Row(2, 1, 0.2, 0.2)])
+		loading = asyncio.create_task(index.load(db, CATALOG))
+		await db.started.wait()
+
+		index.add('gold', 3, 0.5, 0.5)
+		index.remove('gold', 2)
+		pending = index.reserve('gold', 0.7, 0.7)
+		index.remove('iron', reserved)
+
+		db.release.set()
+		await loading
+		return index, pending
+
+	index, pending = asyncio.run(run())
+	assert index.near('gold', 0.1, 0.1, 0.001) == 1
+	assert index.near('gold', 0.2, 0.2, 0.001) is None
+	assert index.near('gold', 0.5, 0.5, 0.001) == 3
+	assert index.near('gold', 0.7, 0.7, 0.001) == pending
+	assert index.near('iron', 0.3, 0.3, 0.001) is None
+	assert index._journals == []
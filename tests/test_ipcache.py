@@ -0,0 +1,73 @@
+import asyncio
+import collections
+
+import pytest
+
+from coreborn import ipcache
+from coreborn.ipcache import IPCache
+
+Row = collections.namedtuple('Row', 'id blocked')
+
+class Database:
+	def __init__(self):
+		self.lookups = []
+
+	async def execute(self, statement, values):
+		ip_hash, = values
+		self.lookups.append(ip_hash)
+		return Row(len(self.lookups), False)
+
+@pytest.fixture
+def clock(monkeypatch):
+	now = [1000.0]
+	monkeypatch.setattr(ipcache.time, 'monotonic', lambda: now[0])
+	return now
+
+def lookup(cache, db, ip_hash):
+	return asyncio.run(cache.lookup(db, ip_hash))
+
+def test_hits_are_served_from_memory(clock):
+	cache, db = IPCache(), Database()
+
+	assert lookup(cache, db, 'a') == lookup(cache, db, 'a')
+	assert db.lookups == ['a']
+	assert cache.stats == {'size' : 1, 'hits' : 1, 'misses' : 1}
+
+def test_entries_expire_after_the_ttl(clock):
+	cache, db = IPCache(ttl=30), Database()
+
+	lookup(cache, db, 'a')
+	clock[0] += 29
+	lookup(cache, db, 'a')
+	assert db.lookups == ['a']
+
+	clock[0] += 2
+	lookup(cache, db, 'a')
+	assert db.lookups == ['a', 'a']
+
+def test_least_recently_used_is_evicted(clock):
+	cache, db = IPCache(max_size=2), Database()
+
+	lookup(cache, db, 'a')
+	lookup(cache, db, 'b')
+	# A hit makes 'a' the most recently used, so 'b' goes
+	lookup(cache, db, 'a')
+	lookup(cache, db, 'c')
+
+	assert list(cache.entries) == ['a', 'c']
+	lookup(cache, db, 'b')
+	assert db.lookups == ['a', 'b', 'c', 'b']
+
+def test_invalidate(clock):
+	cache, db = IPCache(), Database()
+	for ip_hash in ('a', 'b', 'c'):
+		lookup(cache, db, ip_hash)
+
+	cache.invalidate('b')
+	cache.invalidate('unknown')
+	assert list(cache.entries) == ['a', 'c']
+
+	cache.invalidate()
+	assert cache.stats['size'] == 0
+	lookup(cache, db, 'a')
+	assert db.lookups == ['a', 'b', 'c', 'a']
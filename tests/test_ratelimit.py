@@ -0,0 +1,18 @@
+from coreborn.ratelimit import RateLimiter
+
+def test_cost_above_burst_is_rejected_without_blocking():
+	limiter = RateLimiter(rate=1, burst=5, block_after=2)
+
+	for _ in range(3):
+		assert limiter.check('ip', 6) == (False, None, False)
+
+	# The bucket is untouched, a request that fits still goes through
+	assert limiter.check('ip', 5) == (True, 0, False)
+
+def test_block_after_rejections():
+	limiter = RateLimiter(rate=1, burst=1, block_after=2)
+
+	assert limiter.check('ip')[0] is True
+	assert limiter.check('ip')[2] is False
+	assert limiter.check('ip')[2] is True
+	assert limiter.check('ip')[2] is False
@@ -0,0 +1,26 @@
+import asyncio
+import gzip
+
+from coreborn.snapshot import MapEntry
+
+DATA = {
+	'mining' : {
+		'gold' : {'icon' : None, 'color' : '#FFD700', 'visible' : True, 'positions' : [
+			{'id' : identity, 'x' : identity / 1000, 'y' : 1 - identity / 1000} for identity in range(1000)
+		]},
+	},
+}
+
+def test_compressed_variants_decompress_to_the_body():
+	entry = MapEntry.build(1, DATA)
+
+	async def fetch():
+		return await asyncio.gather(*(entry.encoded('json', 'gzip') for _ in range(5)))
+
+	bodies = asyncio.run(fetch())
+	assert all(body is bodies[0] for body in bodies)
+	assert gzip.decompress(bodies[0]) == entry.body
+
+def test_uncompressed_full_map_is_the_body():
+	entry = MapEntry.build(1, DATA)
+	assert asyncio.run(entry.encoded()) is entry.body
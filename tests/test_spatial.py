@@ -0,0 +1,63 @@
+import math
+import random
+
+from coreborn.spatial import SpatialGrid, cluster_pyramid
+
+def brute_within(points, x0, y0, x1, y1):
+	return {identity for identity, (x, y) in points.items() if x0 <= x <= x1 and y0 <= y <= y1}
+
+def test_within_matches_a_full_scan():
+	random.seed(1)
+	points = {identity : (random.random(), random.random()) for identity in range(2000)}
+	grid = SpatialGrid()
+	for identity, (x, y) in points.items():
+		grid.insert(identity, x, y)
+
+	for _ in range(50):
+		x0, x1 = sorted((random.random(), random.random()))
+		y0, y1 = sorted((random.random(), random.random()))
+		assert {identity for identity, x, y, item in grid.within(x0, y0, x1, y1)} == brute_within(points, x0, y0, x1, y1)
+
+def test_nearby_uses_the_radius_not_the_box():
+	grid = SpatialGrid()
+	grid.insert('center', 0.5, 0.5)
+	grid.insert('corner', 0.5 + 0.009, 0.5 + 0.009)
+	grid.insert('inside', 0.5 + 0.0099, 0.5)
+
+	assert {identity for identity, x, y, item in grid.nearby(0.5, 0.5, 0.01)} == {'center', 'inside'}
+	assert math.hypot(0.009, 0.009) > 0.01
+
+def test_points_on_the_map_edges():
+	grid = SpatialGrid()
+	grid.insert('origin', 0.0, 0.0)
+	grid.insert('far', 1.0, 1.0)
+
+	assert [identity for identity, x, y, item in grid.within(0.0, 0.0, 1.0, 1.0)] in (['origin', 'far'], ['far', 'origin'])
+	assert [identity for identity, x, y, item in grid.nearby(1.0, 1.0, 0.001)] == ['far']
+
+def test_reinsert_moves_and_remove_forgets():
+	grid = SpatialGrid()
+	grid.insert(1, 0.1, 0.1, item='first')
+	grid.insert(1, 0.9, 0.9, item='moved')
+
+	assert len(grid) == 1
+	assert list(grid.within(0.0, 0.0, 0.2, 0.2)) == []
+	assert list(grid.within(0.8, 0.8, 1.0, 1.0)) == [(1, 0.9, 0.9, 'moved')]
+
+	assert grid.remove(1) is True
+	assert grid.remove(1) is False
+	assert 1 not in grid
+	assert grid.cells == {}
+
+def test_cluster_pyramid_counts_every_point_on_every_level():
+	random.seed(2)
+	points = [(random.random(), random.random()) for _ in range(500)]
+	levels = cluster_pyramid(points, max_zoom=4)
+
+	assert len(levels) == 5
+	[root] = levels[0]
+	assert root['count'] == 500
+	assert abs(root['x'] - sum(x for x, y in points) / 500) < 1e-9
+	assert abs(root['y'] - sum(y for x, y in points) / 500) < 1e-9
+	for level in levels:
+		assert sum(cluster['count'] for cluster in level) == 500
@@ -0,0 +1,119 @@
+import asyncio
+import collections
+import json
+import random
+import types
+
+import pytest
+
+from coreborn.streaming import relay, stream_map
+
+Row = collections.namedtuple('Row', 'resource id x y')
+
+class Catalog:
+	resources = {'mining' : ('gold', 'iron'), 'woodworking' : ('heartwood', )}
+	ids = {'gold' : 1, 'iron' : 2, 'heartwood' : 3}
+
+	def id_of(self, resource):
+		return self.ids.get(resource)
+
+class Database:
+	"""
+	Stands in for Database.stream(): applies the filters of STREAM_POSITIONS to a list of rows.
+	"""
+	def __init__(self, rows):
+		self.rows = rows
+		self.closed = False
+
+	async def stream(self, statement, values, size=1000):
+		ids, x0, x1, y0, y1, order = values
+		rows = sorted(
+			(row for row in self.rows if row.resource in ids and x0 <= row.x <= x1 and y0 <= row.y <= y1),
+			key=lambda row: (order.index(row.resource), row.id)
+		)
+		try:
+			for index in range(0, len(rows), size):
+				yield rows[index:index + size]
+		finally:
+			self.closed = True
+
+def reference(rows, category=None, resource='*', viewport=None):
+	x0, y0, x1, y1 = viewport or (0.0, 0.0, 1.0, 1.0)
+	result = {}
+	for name, members in Catalog.resources.items():
+		if category not in (None, name):
+			continue
+		for member in members:
+			if resource not in ('*', member):
+				continue
+			result.setdefault(name, {})[member] = {
+				'icon' : None,
+				'color' : '#F444FF',
+				'visible' : True,
+				'positions' : [
+					{'id' : row.id, 'x' : row.x, 'y' : row.y}
+					for row in sorted(rows, key=lambda row: row.id)
+					if row.resource == Catalog.ids[member] and x0 <= row.x <= x1 and y0 <= row.y <= y1
+				]
+			}
+	return result
+
+async def collect(chunks):
+	return b''.join([chunk async for chunk in chunks])
+
+@pytest.fixture
+def rows():
+	random.seed(3)
+	# More than one batch, and iron is left without positions
+	return [Row(random.choice((1, 3)), identity, random.random(), random.random()) for identity in range(2500)]
+
+@pytest.mark.parametrize('selection', [
+	{},
+	{'category' : 'mining'},
+	{'resource' : 'heartwood'},
+	{'category' : 'woodworking', 'resource' : 'heartwood'},
+	{'resource' : 'iron'},
+	{'viewport' : (0.1, 0.2, 0.5, 0.6)},
+	{'category' : 'nothing'},
+])
+def test_stream_map_matches_a_full_build(rows, selection):
+	database = Database(rows)
+	body = asyncio.run(collect(stream_map(database, Catalog(), types.SimpleNamespace(), **selection)))
+
+	assert json.loads(body) == reference(rows, **selection)
+	assert database.closed
+
+def test_relay_passes_everything_on():
+	async def chunks():
+		for index in range(100):
+			yield str(index).encode()
+
+	slots = asyncio.Semaphore(1)
+	body = asyncio.run(collect(relay(chunks(), slots, timeout=1, buffer=4)))
+
+	assert body == b''.join(str(index).encode() for index in range(100))
+	assert not slots.locked()
+
+def test_relay_lets_go_of_the_database_when_the_client_stalls():
+	closed = asyncio.Event()
+
+	async def chunks():
+		try:
+			for index in range(100):
+				yield b'x'
+		finally:
+			closed.set()
+
+	async def stalled_client():
+		slots = asyncio.Semaphore(1)
+		stream = relay(chunks(), slots, timeout=0.05, buffer=2)
+		received = [await anext(stream)]
+		# The client stops reading, the database side has to give up on its own
+		await asyncio.wait_for(closed.wait(), timeout=1)
+		assert not slots.locked()
+
+		received += [chunk async for chunk in stream]
+		return received
+
+	received = asyncio.run(stalled_client())
+	assert 1 < len(received) < 100
@@ -0,0 +1,114 @@
+import json
+import struct
+
+from coreborn import wire
+from coreborn.encoding import CODINGS, negotiate_coding
+
+DATA = {
+	'mining' : {
+		'gold' : {'icon' : None, 'color' : '#FFD700', 'visible' : True, 'positions' : [
+			{'id' : 1, 'x' : 0.25, 'y' : 0.75},
+			{'id' : 2 ** 40, 'x' : 0.0, 'y' : 1.0},
+		]},
+		'iron' : {'icon' : None, 'color' : '#C2C2C2', 'visible' : True, 'positions' : []},
+	},
+	'woodworking' : {
+		'heartwood' : {'icon' : None, 'color' : '#FF0000', 'visible' : True, 'positions' : [
+			{'id' : 3, 'x' : 0.123456789, 'y' : 0.987654321},
+		]},
+	},
+}
+
+def decode_binary(body):
+	"""
+	Reference decoder, written from the format description in coreborn/wire.py
+	"""
+	assert body[:8] == b'CBMAP1\0\0'
+	offset = 8
+	count, = struct.unpack_from('<H', body, offset)
+	offset += 2
+
+	result = {}
+	for _ in range(count):
+		length = body[offset]
+		category = body[offset + 1:offset + 1 + length].decode('UTF-8')
+		offset += 1 + length
+		length = body[offset]
+		name = body[offset + 1:offset + 1 + length].decode('UTF-8')
+		offset += 1 + length
+
+		positions, = struct.unpack_from('<I', body, offset)
+		offset += 4
+		ids = struct.unpack_from(f'<{positions}Q', body, offset)
+		offset += 8 * positions
+		xs = struct.unpack_from(f'<{positions}H', body, offset)
+		offset += 2 * positions
+		ys = struct.unpack_from(f'<{positions}H', body, offset)
+		offset += 2 * positions
+
+		result.setdefault(category, {})[name] = list(zip(ids, xs, ys))
+
+	assert offset == len(body)
+	return result
+
+def test_binary_round_trip():
+	decoded = decode_binary(wire.binary(DATA))
+
+	assert list(decoded) == ['mining', 'woodworking']
+	assert list(decoded['mining']) == ['gold', 'iron']
+	assert decoded['mining']['iron'] == []
+
+	for category, resources in DATA.items():
+		for name, info in resources.items():
+			for position, (identity, x, y) in zip(info['positions'], decoded[category][name], strict=True):
+				assert identity == position['id']
+				assert abs(x / wire.SCALE - position['x']) <= 0.5 / wire.SCALE
+				assert abs(y / wire.SCALE - position['y']) <= 0.5 / wire.SCALE
+
+def test_binary_of_an_empty_map():
+	assert decode_binary(wire.binary({})) == {}
+
+def test_columnar_matches_binary():
+	columnar = json.loads(wire.encode(DATA, 'columnar'))
+	decoded = decode_binary(wire.binary(DATA))
+
+	assert columnar['scale'] == wire.SCALE
+	for category, resources in decoded.items():
+		for name, positions in resources.items():
+			info = columnar['categories'][category][name]
+			assert list(zip(info['ids'], info['x'], info['y'])) == positions
+			assert info['color'] == DATA[category][name]['color']
+
+def test_quantize_clamps_to_the_map():
+	assert wire.quantize(-0.1) == 0
+	assert wire.quantize(1.1) == wire.SCALE
+	assert wire.quantize(0.5) in (32767, 32768)
+
+def test_negotiate():
+	assert wire.negotiate(None, None) == 'json'
+	assert wire.negotiate('binary', 'application/json') == 'binary'
+	assert wire.negotiate('nonsense', None) is None
+	assert wire.negotiate(None, 'application/vnd.coreborn.map') == 'binary'
+	assert wire.negotiate(None, 'text/html, */*') == 'json'
+
+def test_negotiate_q_values():
+	assert wire.negotiate(None, 'application/json;q=0.5, application/vnd.coreborn.map') == 'binary'
+	assert wire.negotiate(None, 'application/vnd.coreborn.map;q=0, application/json;q=0.1') == 'json'
+	assert wire.negotiate(None, 'application/vnd.coreborn.columnar+json, application/vnd.coreborn.map') == 'columnar'
+	assert wire.negotiate(None, 'application/vnd.coreborn.map;q=0.9, */*;q=0.8') == 'binary'
+	assert wire.negotiate(None, 'application/vnd.coreborn.map;q=0.5, */*') == 'json'
+	assert wire.negotiate(None, 'application/json;q=0, */*') == 'columnar'
+	assert wire.negotiate(None, 'application/vnd.coreborn.map; q=0.2 , application/json ; q=0.1') == 'binary'
+	assert wire.negotiate(None, 'application/vnd.coreborn.map;q=0') == 'json'
+	assert wire.negotiate(None, 'application/vnd.coreborn.map;q=nonsense, application/json;q=0.1') == 'json'
+
+def test_negotiate_coding_q_values():
+	preferred = CODINGS[0]
+	assert negotiate_coding(None) is None
+	assert negotiate_coding('identity') is None
+	assert negotiate_coding('gzip;q=1.0, br;q=0.1') == 'gzip'
+	assert negotiate_coding('gzip;Q=0') is None
+	assert negotiate_coding('gzip; q=0.5 , br ; q=0.5') == preferred
+	assert negotiate_coding('*') == preferred
+	assert negotiate_coding('*;q=0.2, gzip;q=0') == ('br' if 'br' in CODINGS else None)
+	assert negotiate_coding('gzip;q=nonsense') is None
@@ -0,0 +1,97 @@
+import asyncio
+
+from coreborn.writebehind import WriteBehind
+
+class Recorder:
+	def __init__(self, fail=False):
+		self.batches = []
+		self.fail = fail
+
+	async def __call__(self, items):
+		self.batches.append(items)
+		if self.fail:
+			raise ValueError('database is gone')
+		return [item * 10 for item in items]
+
+def test_flushes_once_the_batch_is_full():
+	async def run():
+		flush = Recorder()
+		writebehind = WriteBehind(flush, batch_size=3, interval=60)
+		writebehind.start()
+		futures = [writebehind.submit(item) for item in range(3)]
+
+		results = await asyncio.wait_for(asyncio.gather(*futures), timeout=1)
+		await writebehind.stop()
+		return flush.batches, results
+
+	batches, results = asyncio.run(run())
+	assert batches == [[0, 1, 2]]
+	assert results == [0, 10, 20]
+
+def test_flushes_after_the_interval():
+	async def run():
+		flush = Recorder()
+		writebehind = WriteBehind(flush, batch_size=100, interval=0.05)
+		writebehind.start()
+		futures = [writebehind.submit(item) for item in range(2)]
+
+		results = await asyncio.wait_for(asyncio.gather(*futures), timeout=1)
+		stats = writebehind.stats
+		await writebehind.stop()
+		return flush.batches, results, stats
+
+	batches, results, stats = asyncio.run(run())
+	assert batches == [[0, 1]]
+	assert results == [0, 10]
+	assert stats['batches'] == 1 and stats['flushed'] == 2
+
+def test_submit_returns_none_when_the_queue_is_full():
+	async def run():
+		writebehind = WriteBehind(Recorder(), batch_size=100, interval=60, max_queue=2)
+		writebehind.start()
+		submitted = [writebehind.submit(item) for item in range(3)]
+		await writebehind.stop()
+		return submitted
+
+	submitted = asyncio.run(run())
+	assert all(future is not None for future in submitted[:2])
+	assert submitted[2] is None
+
+def test_stop_drains_the_queue():
+	async def run():
+		flush = Recorder()
+		writebehind = WriteBehind(flush, batch_size=2, interval=60)
+		writebehind.start()
+		futures = [writebehind.submit(item) for item in range(5)]
+		await writebehind.stop()
+		return flush.batches, futures
+
+	batches, futures = asyncio.run(run())
+	assert sorted(item for batch in batches for item in batch) == [0, 1, 2, 3, 4]
+	assert all(len(batch) <= 2 for batch in batches)
+	assert [future.result() for future in futures] == [0, 10, 20, 30, 40]
+
+def test_failed_flush_of_detached_items_is_logged_once(capsys):
+	async def run():
+		flush = Recorder(fail=True)
+		writebehind = WriteBehind(flush, batch_size=4, interval=60)
+		writebehind.start()
+		detached = [writebehind.submit(item, detached=True) for item in range(3)]
+		waited = writebehind.submit(3)
+
+		try:
+			await asyncio.wait_for(waited, timeout=1)
+		except ValueError:
+			pass
+
+		await writebehind.stop()
+		# Lets the done callbacks run
+		await asyncio.sleep(0)
+		return detached, writebehind.stats
+
+	detached, stats = asyncio.run(run())
+	assert stats['failures'] == 1
+	assert capsys.readouterr().out.count('failed') == 1
+	# Nobody awaits these, so asyncio would report each one as "Future exception was never retrieved"
+	assert not any(future._log_traceback for future in detached)
+	assert all(isinstance(future.exception(), ValueError) for future in detached)